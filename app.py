@@ -1,21 +1,128 @@
 # app.py
 
-from flask import Flask, render_template, request, redirect, url_for, session, flash, g
+from flask import Flask, render_template, stream_template, request, redirect, url_for, session, flash, get_flashed_messages, g, jsonify, send_from_directory, stream_with_context
+from jinja2 import FileSystemBytecodeCache
+from markupsafe import Markup, escape
 import sqlite3
 import os
+import re
 from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import safe_join
 import json
+import csv
+import io
+import click
+import multiprocessing
+import mimetypes
+from contextlib import closing
+from urllib.request import pathname2url
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
 
 # NEW: Imports for scheduling and database backup
-from threading import Thread
+from threading import Thread, Lock, BoundedSemaphore, Event
 import time
+import atexit
 import shutil
+import hashlib
+
+# NEW: Optional libraries for the executive summary exports (XLSX and PDF)
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, TableStyle
+except ImportError:
+    SimpleDocTemplate = None
 
 app = Flask(__name__)
 app.secret_key = b'clave_fija_produccion_123456'
 app.config['DATABASE'] = 'hospital_checklist.db'
 app.config['BACKUP_FOLDER'] = 'BACKUP_BD' # NEW: Define the backup folder
+app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:600000' # NEW: Hash policy; older hashes are upgraded on login
+app.config['LOGIN_MAX_FAILURES_PER_USER'] = 5 # NEW: Failed logins per username within LOGIN_FAILURE_WINDOW before blocking
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = 100 # NEW: Per IP; high because a whole hospital may share one NAT address
+app.config['ALERT_CUTOFF_TIMES'] = ['12:00', '20:00'] # NEW: Daily checks for missing reports; the last one closes the day
+app.config['EXPORT_FOLDER'] = 'EXPORTS' # NEW: Generated executive summaries, named by content key
+app.config['CHANGE_FEED_RETENTION_DAYS'] = 30 # NEW: Journal rows stay readable from /changes at least this long, even once backed up
+app.config['COMPARISON_PARALLEL_MIN_REPORTS'] = 5000 # NEW: Ranges expected to hold more reports are compared in a process pool
+app.config['ARCHIVE_FOLDER'] = 'ARCHIVE_BD' # NEW: Per-year archive databases (reports_YYYY.db)
+app.config['ANALYTICS_DATABASE'] = 'hospital_checklist_analytics.db' # NEW: Read-only snapshot used by the analytics pages
+app.config['ANALYTICS_MAX_STALENESS'] = 5 * 60 # NEW: Seconds; an older snapshot is refreshed before it is read
+app.config['ANALYTICS_REFRESH_INTERVAL'] = 60 # NEW: Seconds between background snapshot refreshes
+app.config['ASSET_MANIFEST'] = os.path.join(app.static_folder, 'dist', 'manifest.json') # NEW: Written by build_assets.py
+app.config['TEMPLATE_CACHE_FOLDER'] = os.path.join(app.instance_path, 'jinja_cache') # NEW: Compiled template bytecode
+
+# NEW: Reuse compiled templates across restarts and worker processes instead of re-parsing them
+os.makedirs(app.config['TEMPLATE_CACHE_FOLDER'], exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(app.config['TEMPLATE_CACHE_FOLDER'])
+
+# NEW: Self-hosted, fingerprinted front-end assets
+ASSET_MAX_AGE = 365 * 24 * 3600 # File names change with their content, so they can be cached "forever"
+
+# Used while build_assets.py has not been run (e.g. in development)
+ASSET_FALLBACKS = {
+    'chart.js': 'https://cdn.jsdelivr.net/npm/chart.js',
+    'alpine.js': 'https://cdn.jsdelivr.net/npm/alpinejs@3.x.x/dist/cdn.min.js',
+}
+
+_asset_manifest = None
+
+def get_asset_manifest():
+    global _asset_manifest
+    if _asset_manifest is None:
+        try:
+            with open(app.config['ASSET_MANIFEST']) as f:
+                _asset_manifest = json.load(f)
+        except (OSError, ValueError):
+            _asset_manifest = {}
+    return _asset_manifest
+
+@app.template_global()
+def asset_url(name):
+    """URL of a built asset; falls back to the CDN (or static/) copy when there is no build."""
+    hashed_name = get_asset_manifest().get(name)
+    if hashed_name:
+        return url_for('built_asset', filename=hashed_name)
+    if name in ASSET_FALLBACKS:
+        return ASSET_FALLBACKS[name]
+    if os.path.splitext(name)[1] == '.css':
+        return None
+    return url_for('static', filename=name)
+
+_tailwind_theme = None
+
+@app.template_global()
+def tailwind_theme():
+    """Theme shared by tailwind.config.js and the in-browser Tailwind fallback of base.html."""
+    global _tailwind_theme
+    if _tailwind_theme is None:
+        with open(os.path.join(app.root_path, 'tailwind.theme.json')) as f:
+            _tailwind_theme = json.load(f)
+    return _tailwind_theme
+
+@app.route('/assets/<path:filename>')
+def built_asset(filename):
+    """Serves fingerprinted assets, preferring their precompressed brotli/gzip variants."""
+    dist_folder = os.path.join(app.static_folder, 'dist')
+    accepted = request.accept_encodings
+    for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if accepted[encoding] and os.path.isfile(safe_join(dist_folder, filename + suffix) or ''):
+            response = send_from_directory(dist_folder, filename + suffix, max_age=ASSET_MAX_AGE)
+            response.headers['Content-Encoding'] = encoding
+            response.mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            break
+    else:
+        response = send_from_directory(dist_folder, filename, max_age=ASSET_MAX_AGE)
+    response.headers['Cache-Control'] = f'public, max-age={ASSET_MAX_AGE}, immutable'
+    response.vary.add('Accept-Encoding')
+    return response
 
 # Database setup
 def get_db():
@@ -25,72 +132,442 @@ def get_db():
         db.row_factory = sqlite3.Row
     return db
 
+# NEW: Analytics snapshot. Statistics and trends read a copy of the database refreshed with the
+# SQLite backup API, so long range queries do not contend with the hospitals' submissions.
+ANALYTICS_COPY_PAGES = 256 # Pages copied per backup step; report commits are only blocked during a step
+ANALYTICS_COPY_SLEEP = 0.005 # Seconds between steps
+
+_analytics_refresh_lock = Lock()
+
+def get_analytics_snapshot_age():
+    """Seconds since the snapshot was last refreshed (infinite if it does not exist yet)."""
+    try:
+        return time.time() - os.path.getmtime(app.config['ANALYTICS_DATABASE'])
+    except OSError:
+        return float('inf')
+
+def _analytics_data_version(conn):
+    """Changes whenever the reports or the checklist versions (what the analytics pages read) change."""
+    return conn.execute(
+        "SELECT (SELECT seq FROM sqlite_sequence WHERE name = 'report_changes'), (SELECT COALESCE(MAX(version), 0) FROM checklist_schemas)"
+    ).fetchone()
+
+def refresh_analytics_snapshot(max_age=0):
+    """Brings the snapshot up to date unless it is younger than max_age seconds.
+
+    When no report changed since the last copy the snapshot is only marked as current. Otherwise
+    the database is copied into a temporary file in steps of ANALYTICS_COPY_PAGES and swapped in,
+    so submissions are never locked out for a whole copy and readers of the old snapshot never wait.
+    Returns True if a new copy was made.
+    """
+    with _analytics_refresh_lock:
+        if get_analytics_snapshot_age() <= max_age:
+            return False
+        path = app.config['ANALYTICS_DATABASE']
+        with closing(sqlite3.connect(app.config['DATABASE'])) as conn_source:
+            if os.path.exists(path):
+                try:
+                    with closing(connect_read_only(path)) as conn_snapshot:
+                        unchanged = _analytics_data_version(conn_snapshot) == _analytics_data_version(conn_source)
+                except sqlite3.Error:
+                    unchanged = False
+                if unchanged:
+                    os.utime(path)
+                    return False
+            partial_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                with closing(sqlite3.connect(partial_path)) as conn_partial:
+                    conn_source.backup(conn_partial, pages=ANALYTICS_COPY_PAGES, sleep=ANALYTICS_COPY_SLEEP)
+                os.replace(partial_path, path)
+            finally:
+                if os.path.exists(partial_path):
+                    os.remove(partial_path)
+        return True
+
+def _refresh_analytics_in_background():
+    try:
+        refresh_analytics_snapshot(max_age=app.config['ANALYTICS_MAX_STALENESS'])
+    except (sqlite3.Error, OSError) as e:
+        print(f"Analytics snapshot refresh failed: {e}")
+
+def connect_read_only(path):
+    return sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+
+def get_analytics_db():
+    """Read-only connection to the analytics snapshot.
+
+    Only a missing snapshot is created on the request path; a stale one is served as is while a
+    background thread refreshes it (the page shows its "Datos al" time).
+    """
+    db = getattr(g, '_analytics_database', None)
+    if db is None:
+        if not os.path.exists(app.config['ANALYTICS_DATABASE']):
+            refresh_analytics_snapshot()
+        elif get_analytics_snapshot_age() > app.config['ANALYTICS_MAX_STALENESS'] and not _analytics_refresh_lock.locked():
+            Thread(target=_refresh_analytics_in_background, daemon=True).start()
+        path = os.path.abspath(app.config['ANALYTICS_DATABASE'])
+        db = g._analytics_database = connect_read_only(path)
+        db.row_factory = sqlite3.Row
+        g.analytics_as_of = datetime.fromtimestamp(os.path.getmtime(path))
+    return db
+
+@app.template_global()
+def analytics_as_of():
+    """When the snapshot read by the current request was taken, for the "Datos al" indicator."""
+    as_of = g.get('analytics_as_of')
+    return as_of.strftime('%Y-%m-%d %H:%M') if as_of else None
+
+# NEW: Numbered schema migrations. Each one runs once, in order, and is recorded in the schema_version
+# table; they are applied by `flask --app app migrate` (or init_db()), never while serving requests.
+MIGRATIONS = []
+MIGRATION_BATCH_SIZE = 1000
+
+def migration(version, transactional=True):
+    """Registers a migration. Non-transactional ones commit as they go and must be safe to re-run."""
+    def register(func):
+        MIGRATIONS.append((version, func, transactional))
+        MIGRATIONS.sort(key=lambda entry: entry[0])
+        return func
+    return register
+
+def run_in_batches(db, sql, params=()):
+    """Repeats a statement ending in "LIMIT ?" until it affects no rows, committing after each batch.
+
+    Used for backfills on large tables so writers are never locked out for long.
+    """
+    while db.execute(sql, (*params, MIGRATION_BATCH_SIZE)).rowcount:
+        db.commit()
+
+@migration(1)
+def create_base_tables(db):
+    # IF NOT EXISTS: databases created before migrations existed already have these tables
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            username TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            role TEXT NOT NULL,
+            hospital_id TEXT
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hospital_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            checklist_data TEXT NOT NULL,
+            observations TEXT,
+            met_goal INTEGER,
+            operations_performed INTEGER,
+            submitted_by INTEGER,
+            submitted_at TEXT,
+            FOREIGN KEY (submitted_by) REFERENCES users(id)
+        )
+    ''')
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER,
+            action TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            ip_address TEXT,
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+@migration(2)
+def create_checklist_schemas(db):
+    # Versioned checklist definitions; each report is tagged with the version it was filled with
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS checklist_schemas (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,
+            definition TEXT NOT NULL,
+            created_at TEXT NOT NULL
+        )
+    ''')
+    report_columns = {row['name'] for row in db.execute('PRAGMA table_info(reports)')}
+    if 'schema_version' not in report_columns:
+        db.execute('ALTER TABLE reports ADD COLUMN schema_version INTEGER REFERENCES checklist_schemas(version)')
+    if db.execute('SELECT COUNT(*) FROM checklist_schemas').fetchone()[0] == 0:
+        db.execute(
+            'INSERT INTO checklist_schemas (definition, created_at) VALUES (?, ?)',
+            (_serialize_checklist_items(CHECKLIST_ITEMS), datetime.now().isoformat())
+        )
+
+@migration(3, transactional=False)
+def backfill_report_schema_versions(db):
+    # Untagged (legacy) reports belong to the first checklist version
+    first_version = db.execute('SELECT MIN(version) FROM checklist_schemas').fetchone()[0]
+    run_in_batches(
+        db,
+        'UPDATE reports SET schema_version = ? WHERE id IN (SELECT id FROM reports WHERE schema_version IS NULL LIMIT ?)',
+        (first_version,)
+    )
+
+@migration(4)
+def create_report_unique_index(db):
+    # One report per hospital and day, required for upserts. The latest duplicate stays in reports;
+    # older ones are moved to reports_duplicates (never deleted) so they can be reviewed.
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS reports_duplicates (
+            id INTEGER PRIMARY KEY,
+            hospital_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            checklist_data TEXT NOT NULL,
+            observations TEXT,
+            met_goal INTEGER,
+            operations_performed INTEGER,
+            submitted_by INTEGER,
+            submitted_at TEXT,
+            schema_version INTEGER,
+            moved_at TEXT NOT NULL
+        )
+    ''')
+    duplicates = 'SELECT id FROM reports WHERE id NOT IN (SELECT MAX(id) FROM reports GROUP BY hospital_id, date)'
+    now = datetime.now().isoformat()
+    moved = db.execute(f'''
+        INSERT INTO reports_duplicates
+        SELECT id, hospital_id, date, checklist_data, observations, met_goal, operations_performed,
+               submitted_by, submitted_at, schema_version, ?
+        FROM reports WHERE id IN ({duplicates})
+    ''', (now,)).rowcount
+    if moved:
+        db.execute(f'DELETE FROM reports WHERE id IN ({duplicates})')
+        db.execute(
+            'INSERT INTO logs (user_id, action, timestamp) VALUES (NULL, ?, ?)',
+            (f'migration 4 moved {moved} duplicate reports to reports_duplicates', now)
+        )
+        app.logger.warning(f"Moved {moved} duplicate reports (same hospital and date) to reports_duplicates")
+    db.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_reports_hospital_date ON reports (hospital_id, date)')
+
+@migration(5)
+def create_idempotency_keys(db):
+    # Responses of /api/checklist submissions, keyed by the client's idempotency key
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            key TEXT NOT NULL,
+            status_code INTEGER NOT NULL,
+            response TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            PRIMARY KEY (user_id, key),
+            FOREIGN KEY (user_id) REFERENCES users(id)
+        )
+    ''')
+
+@migration(6)
+def seed_users(db):
+    if db.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
+        method = app.config['PASSWORD_HASH_METHOD']
+        users = [
+            ('admin', generate_password_hash('admin123', method=method), 'admin', None),
+            ('hgz24', generate_password_hash('pass24', method=method), 'hospital', 'hgz24'),
+            ('hgz27', generate_password_hash('pass27', method=method), 'hospital', 'hgz27'),
+            ('hgz29', generate_password_hash('pass29', method=method), 'hospital', 'hgz29'),
+            ('hgz48', generate_password_hash('pass48', method=method), 'hospital', 'hgz48'),
+            ('gineco3a', generate_password_hash('pass3a', method=method), 'hospital', 'gineco3a')
+        ]
+        db.executemany('INSERT INTO users (username, password, role, hospital_id) VALUES (?, ?, ?, ?)', users)
+
+@migration(7, transactional=False)
+def create_problem_streaks(db):
+    # Consecutive days each checklist item has been reported unchecked, kept up to date by save_report()
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS problem_streaks (
+            hospital_id TEXT NOT NULL,
+            item TEXT NOT NULL,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            streak_start TEXT,
+            last_seen TEXT,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            longest_end TEXT,
+            updated_through TEXT,
+            PRIMARY KEY (hospital_id, item)
+        )
+    ''')
+    # Active streaks are the ones that include the hospital's latest report
+    db.execute(
+        'CREATE INDEX IF NOT EXISTS idx_problem_streaks_active ON problem_streaks (current_streak) '
+        'WHERE last_seen = updated_through'
+    )
+    for row in db.execute('SELECT DISTINCT hospital_id FROM reports').fetchall():
+        rebuild_problem_streaks(db, row['hospital_id'])
+        db.commit()
+
+@migration(8)
+def create_alerts(db):
+    # Missed-submission and below-goal events written by run_alert_checks()
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS alerts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            hospital_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            detail TEXT,
+            created_at TEXT NOT NULL,
+            resolved_at TEXT,
+            UNIQUE (hospital_id, date, kind)
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_alerts_date_kind ON alerts (date, kind)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_alerts_open ON alerts (hospital_id, kind) WHERE resolved_at IS NULL')
+    # Running compliance per hospital over the days already closed by the last cut-off
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS hospital_compliance (
+            hospital_id TEXT PRIMARY KEY,
+            days_evaluated INTEGER NOT NULL DEFAULT 0,
+            days_reported INTEGER NOT NULL DEFAULT 0,
+            days_missed INTEGER NOT NULL DEFAULT 0,
+            days_below_goal INTEGER NOT NULL DEFAULT 0,
+            last_evaluated_date TEXT
+        )
+    ''')
+
+@migration(9)
+def create_export_jobs(db):
+    # Queue of executive summary exports processed by run_export_jobs()
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS export_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cache_key TEXT NOT NULL,
+            format TEXT NOT NULL,
+            start_date TEXT NOT NULL,
+            end_date TEXT NOT NULL,
+            hospital_ids TEXT NOT NULL,
+            status TEXT NOT NULL,
+            error TEXT,
+            requested_by INTEGER,
+            created_at TEXT NOT NULL,
+            started_at TEXT,
+            finished_at TEXT,
+            FOREIGN KEY (requested_by) REFERENCES users(id)
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_export_jobs_status ON export_jobs (status, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_export_jobs_cache_key ON export_jobs (cache_key)')
+
+@migration(10, transactional=False)
+def create_report_changes(db):
+    # Append-only journal of every change to reports, written by triggers in the same transaction.
+    # AUTOINCREMENT keeps seq increasing (never reused), so it can serve as a replication cursor.
+    # Rows covered by the backups and older than CHANGE_FEED_RETENTION_DAYS are trimmed by trim_report_changes().
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS report_changes (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            op TEXT NOT NULL,
+            changed_at TEXT NOT NULL,
+            report_id INTEGER NOT NULL,
+            hospital_id TEXT NOT NULL,
+            date TEXT NOT NULL,
+            checklist_data TEXT NOT NULL,
+            observations TEXT,
+            met_goal INTEGER,
+            operations_performed INTEGER,
+            submitted_by INTEGER,
+            submitted_at TEXT,
+            schema_version INTEGER
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_report_changes_report ON report_changes (report_id)')
+    for op, event, row in (('insert', 'INSERT', 'NEW'), ('update', 'UPDATE', 'NEW'), ('delete', 'DELETE', 'OLD')):
+        db.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS reports_journal_{op} AFTER {event} ON reports
+            BEGIN
+                INSERT INTO report_changes ({REPORT_CHANGE_COLUMNS})
+                VALUES ('{op}', strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime'), {row}.id, {row}.hospital_id, {row}.date,
+                        {row}.checklist_data, {row}.observations, {row}.met_goal, {row}.operations_performed,
+                        {row}.submitted_by, {row}.submitted_at, {row}.schema_version);
+            END
+        ''')
+    db.commit()
+    # The reports that already exist open the journal, so a consumer starting from seq 0 gets the full table.
+    # The triggers are in place first, so reports changed meanwhile are journaled by them and skipped here.
+    run_in_batches(db, f'''
+        INSERT INTO report_changes ({REPORT_CHANGE_COLUMNS})
+        SELECT 'insert', ?, id, hospital_id, date, checklist_data, observations, met_goal, operations_performed,
+               submitted_by, submitted_at, schema_version
+        FROM reports r WHERE NOT EXISTS (SELECT 1 FROM report_changes c WHERE c.report_id = r.id)
+        ORDER BY id LIMIT ?
+    ''', (datetime.now().isoformat(),))
+
+@migration(11)
+def create_export_jobs_pending_index(db):
+    # At most one queued or running job per cache key, so identical concurrent requests share it
+    db.execute('''
+        UPDATE export_jobs SET status = 'failed', error = 'Duplicada'
+        WHERE status IN ('queued', 'running')
+            AND id NOT IN (SELECT MIN(id) FROM export_jobs WHERE status IN ('queued', 'running') GROUP BY cache_key)
+    ''')
+    db.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_export_jobs_pending ON export_jobs (cache_key) WHERE status IN ('queued', 'running')"
+    )
+
+def get_schema_version(db):
+    """Number of the last applied migration (0 for a new database)."""
+    try:
+        return db.execute('SELECT MAX(version) FROM schema_version').fetchone()[0] or 0
+    except sqlite3.OperationalError:
+        return 0
+
 def init_db():
+    """Applies the pending migrations. Returns the numbers of the migrations applied."""
     with app.app_context():
         db = get_db()
-        cursor = db.cursor()
-        
-        # Create existing tables (users, reports)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL,
-                hospital_id TEXT
-            )
-        ''')
-        
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                hospital_id TEXT NOT NULL,
-                date TEXT NOT NULL,
-                checklist_data TEXT NOT NULL,
-                observations TEXT,
-                met_goal INTEGER,
-                operations_performed INTEGER,
-                submitted_by INTEGER,
-                submitted_at TEXT,
-                FOREIGN KEY (submitted_by) REFERENCES users(id)
-            )
-        ''')
-        
-        # NEW: Create logs table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER,
-                action TEXT NOT NULL,
-                timestamp TEXT NOT NULL,
-                ip_address TEXT,
-                FOREIGN KEY (user_id) REFERENCES users(id)
-            )
-        ''')
-        
-        # Insert initial data if tables are empty
-        if cursor.execute('SELECT COUNT(*) FROM users').fetchone()[0] == 0:
-            users = [
-                ('admin', generate_password_hash('admin123'), 'admin', None),
-                ('hgz24', generate_password_hash('pass24'), 'hospital', 'hgz24'),
-                ('hgz27', generate_password_hash('pass27'), 'hospital', 'hgz27'),
-                ('hgz29', generate_password_hash('pass29'), 'hospital', 'hgz29'),
-                ('hgz48', generate_password_hash('pass48'), 'hospital', 'hgz48'),
-                ('gineco3a', generate_password_hash('pass3a'), 'hospital', 'gineco3a')
-            ]
-            cursor.executemany('INSERT INTO users (username, password, role, hospital_id) VALUES (?, ?, ?, ?)', users)
-            db.commit()
+        db.execute('CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TEXT NOT NULL)')
+        current_version = get_schema_version(db)
+        applied = []
+        for version, func, transactional in MIGRATIONS:
+            if version <= current_version:
+                continue
+            try:
+                if transactional:
+                    db.execute('BEGIN')
+                func(db)
+                db.execute('INSERT INTO schema_version (version, applied_at) VALUES (?, ?)', (version, datetime.now().isoformat()))
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            applied.append(version)
+        # A CHECKLIST_ITEMS change becomes a new schema version here, never from a request
+        register_checklist_schema(db, CHECKLIST_ITEMS)
+        return applied
+
+# Set once the database is known to be up to date, so later requests skip the check
+_schema_checked = False
+
+@app.before_request
+def check_schema_version():
+    """Refuses to serve requests until `flask --app app migrate` has been run against the database."""
+    global _schema_checked
+    if _schema_checked:
+        return None
+    current_version = get_schema_version(get_db())
+    latest_version = MIGRATIONS[-1][0]
+    if current_version < latest_version:
+        app.logger.error(f"Database schema is at version {current_version}, expected {latest_version}. Run: flask --app app migrate")
+        return 'La base de datos no está actualizada. Ejecute: flask --app app migrate', 503
+    try:
+        get_current_checklist_schema()
+    except LookupError:
+        return 'La base de datos no está actualizada. Ejecute: flask --app app migrate', 503
+    _schema_checked = True
+    return None
 
 @app.teardown_appcontext
 def close_connection(exception):
     db = getattr(g, '_database', None)
     if db is not None:
         db.close()
+    analytics_db = getattr(g, '_analytics_database', None)
+    if analytics_db is not None:
+        analytics_db.close()
 
 # Helper function to log actions
 def log_action(user_id, action, ip_address=None):
     db = get_db()
     try:
+        flush_deferred_logs(db)
         db.execute(
             'INSERT INTO logs (user_id, action, timestamp, ip_address) VALUES (?, ?, ?, ?)',
             (user_id, action, datetime.now().isoformat(), ip_address)
@@ -100,6 +577,49 @@ def log_action(user_id, action, ip_address=None):
         print(f"Error logging action: {e}")
         db.rollback()
 
+# NEW: High-volume entries (failed logins) are queued and written in batches: with the next
+# log_action() commit, or once LOG_BATCH_SIZE entries or LOG_FLUSH_INTERVAL seconds have accumulated.
+LOG_BATCH_SIZE = 50
+LOG_FLUSH_INTERVAL = 5 # Seconds
+
+_deferred_logs = []
+_deferred_logs_since = None
+_deferred_logs_lock = Lock()
+
+def defer_log_action(user_id, action, ip_address=None):
+    global _deferred_logs_since
+    with _deferred_logs_lock:
+        _deferred_logs.append((user_id, action, datetime.now().isoformat(), ip_address))
+        if _deferred_logs_since is None:
+            _deferred_logs_since = time.monotonic()
+        due = len(_deferred_logs) >= LOG_BATCH_SIZE or time.monotonic() - _deferred_logs_since >= LOG_FLUSH_INTERVAL
+    if due:
+        db = get_db()
+        try:
+            flush_deferred_logs(db)
+            db.commit()
+        except Exception as e:
+            print(f"Error logging action: {e}")
+            db.rollback()
+
+def flush_deferred_logs(db):
+    """Inserts the queued log entries into db (the caller commits)."""
+    global _deferred_logs_since
+    with _deferred_logs_lock:
+        entries = _deferred_logs[:]
+        _deferred_logs.clear()
+        _deferred_logs_since = None
+    if entries:
+        db.executemany('INSERT INTO logs (user_id, action, timestamp, ip_address) VALUES (?, ?, ?, ?)', entries)
+
+@atexit.register
+def _flush_deferred_logs_at_exit():
+    if _deferred_logs:
+        with app.app_context():
+            db = get_db()
+            flush_deferred_logs(db)
+            db.commit()
+
 # Constants (unchanged)
 HOSPITAL_NAMES = {
     'hgz24': 'HGZ24',
@@ -126,12 +646,631 @@ def format_date(date=None):
     date = date or datetime.now()
     return date.strftime('%Y-%m-%d')
 
+def validate_report_fields(met_goal_value, operations_value):
+    """Applies the checklist form rules to the met_goal / operations_performed fields.
+
+    Returns (met_goal, operations_performed, error). error is None when the values are valid.
+    """
+    if met_goal_value is None:
+        return None, None, 'Por favor, indique si se cumplió con la meta.'
+
+    met_goal = met_goal_value == 'true'
+    if met_goal:
+        return True, None, None
+
+    if operations_value is None or str(operations_value).strip() == '':
+        return False, None, 'Por favor, ingrese el número de operaciones realizadas si la meta no se cumplió.'
+    # JSON payloads may carry any type: int() would truncate 3.9, accept true as 1 and raise
+    # TypeError (a 500) on lists or objects, so only integers, whole floats and numeric text pass
+    if isinstance(operations_value, bool) or not isinstance(operations_value, (int, float, str)):
+        return False, None, 'El número de operaciones debe ser un valor numérico.'
+    if isinstance(operations_value, float) and not operations_value.is_integer():
+        return False, None, 'El número de operaciones debe ser un número entero.'
+    try:
+        operations_performed = int(operations_value)
+    except (TypeError, ValueError, OverflowError):
+        return False, None, 'El número de operaciones debe ser un valor numérico.'
+    if operations_performed > OPERATIONS_PER_DAY or operations_performed < 0:
+        return False, None, 'El número de operaciones no puede ser mayor a 7 ni negativo.'
+    return False, operations_performed, None
+
+def is_truthy(value):
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'on', 'si', 'sí', 'x', 'yes')
+    return bool(value)
+
 def get_default_checklist():
-    default_items = {item: False for category in CHECKLIST_ITEMS.values() for item in category}
-    for category in CHECKLIST_ITEMS:
-        default_items[category + '_otro_checkbox'] = False
-        default_items[category + '_otro_text'] = ''
-    return default_items
+    return get_current_checklist_schema().default_data()
+
+# NEW: Versioned checklist schema
+class ChecklistSchema:
+    """A checklist definition compiled once per version.
+
+    Item keys, the "Otro" field names and analysis order are precomputed so
+    form parsing, unit percentages and analytics don't rebuild them per report.
+    """
+
+    def __init__(self, version, items):
+        self.version = version
+        self.items = items
+        self.item_keys = tuple(item for category_items in items.values() for item in category_items)
+        # (category, checkbox field, text field) for every "Otro" entry
+        self.otro_fields = tuple(
+            (category, f"{category}_otro_checkbox", f"{category}_otro_text") for category in items
+        )
+        # Item keys in analysis order: each category's items followed by its "Otro" checkbox
+        self.analysis_keys = tuple(
+            key
+            for (category, category_items), (_, otro_checkbox, _) in zip(items.items(), self.otro_fields)
+            for key in (*category_items, otro_checkbox)
+        )
+        # Labels used by "Problemas Recurrentes" for unchecked items
+        self.problem_labels = tuple(
+            (item, f"{category}: {item}") for category, category_items in items.items() for item in category_items
+        )
+
+    def default_data(self):
+        data = dict.fromkeys(self.item_keys, False)
+        for _, otro_checkbox, otro_text in self.otro_fields:
+            data[otro_checkbox] = False
+            data[otro_text] = ''
+        return data
+
+    def parse_form(self, form):
+        """Builds checklist_data from submitted form fields."""
+        data = {item: form.get(item) == 'on' for item in self.item_keys}
+        for _, otro_checkbox, otro_text in self.otro_fields:
+            data[otro_checkbox] = form.get(otro_checkbox) == 'on'
+            data[otro_text] = form.get(otro_text, '')
+        return data
+
+    def parse_record(self, record):
+        """Builds checklist_data from an imported record (booleans, 1/0, "on", "sí", ...)."""
+        data = {item: is_truthy(record.get(item)) for item in self.item_keys}
+        for _, otro_checkbox, otro_text in self.otro_fields:
+            data[otro_checkbox] = is_truthy(record.get(otro_checkbox))
+            data[otro_text] = str(record.get(otro_text) or '')
+        return data
+
+    def score(self, data):
+        """Returns (checked, total). "Otro" only counts when its text is filled in."""
+        total = len(self.item_keys)
+        checked = sum(1 for item in self.item_keys if data.get(item))
+        for _, otro_checkbox, otro_text in self.otro_fields:
+            text = data.get(otro_text)
+            if text and text.strip() != '':
+                total += 1
+                if data.get(otro_checkbox):
+                    checked += 1
+        return checked, total
+
+    def unit_percentage(self, data):
+        checked, total = self.score(data)
+        return (checked / total) * 100 if total > 0 else 0
+
+    def item_results(self, data):
+        """Yields (analysis key, checked) for every item that counts towards the score."""
+        for (category, category_items), (_, otro_checkbox, otro_text) in zip(self.items.items(), self.otro_fields):
+            for item in category_items:
+                yield item, data.get(item) == True
+            text = data.get(otro_text)
+            if text and text.strip() != '':
+                yield otro_checkbox, data.get(otro_checkbox) == True
+
+    def unchecked_items(self, data):
+        """Labels of the unchecked items of a report, as shown in "Problemas Recurrentes"."""
+        unchecked = [label for item, label in self.problem_labels if not data.get(item)]
+        for category, otro_checkbox, otro_text in self.otro_fields:
+            text = data.get(otro_text)
+            if text and text.strip() != '' and not data.get(otro_checkbox):
+                unchecked.append(f"{category}: Otro ({text})")
+        return unchecked
+
+# Compiled schemas by version. Definitions are immutable once stored, so entries never expire.
+_checklist_schema_cache = {}
+_current_schema_version = None
+
+def _serialize_checklist_items(items):
+    return json.dumps(items, ensure_ascii=False)
+
+def find_checklist_schema_version(db, items):
+    """Version under which a checklist definition is stored, or None if it was never registered."""
+    row = db.execute(
+        'SELECT version FROM checklist_schemas WHERE definition = ?', (_serialize_checklist_items(items),)
+    ).fetchone()
+    return row[0] if row else None
+
+def register_checklist_schema(db, items):
+    """Stores a checklist definition (if new) and returns its version. Only called from init_db."""
+    version = find_checklist_schema_version(db, items)
+    if version is not None:
+        return version
+    cursor = db.execute(
+        'INSERT INTO checklist_schemas (definition, created_at) VALUES (?, ?)',
+        (_serialize_checklist_items(items), datetime.now().isoformat())
+    )
+    db.commit()
+    return cursor.lastrowid
+
+def get_checklist_schema(version):
+    """Returns the compiled schema for a version, loading it from the database once.
+
+    Raises LookupError for a version missing from checklist_schemas: scoring the report
+    against another version's items would silently give wrong percentages.
+    """
+    if version is None:
+        return get_current_checklist_schema()
+    schema = _checklist_schema_cache.get(version)
+    if schema is None:
+        row = get_db().execute('SELECT definition FROM checklist_schemas WHERE version = ?', (version,)).fetchone()
+        if row is None:
+            app.logger.error(f"Report uses unknown checklist schema version {version}")
+            raise LookupError(f"Versión del checklist desconocida: {version}")
+        schema = _checklist_schema_cache[version] = ChecklistSchema(version, json.loads(row['definition']))
+    return schema
+
+def get_current_checklist_schema():
+    """Returns the compiled schema matching CHECKLIST_ITEMS (the one new reports are tagged with).
+
+    Read-only: the definition is registered by init_db (`flask --app app migrate`), so a
+    CHECKLIST_ITEMS change that was never migrated raises LookupError instead of writing here.
+    """
+    global _current_schema_version
+    if _current_schema_version is None:
+        version = find_checklist_schema_version(get_db(), CHECKLIST_ITEMS)
+        if version is None:
+            app.logger.error("CHECKLIST_ITEMS is not registered in checklist_schemas. Run: flask --app app migrate")
+            raise LookupError("La versión actual del checklist no está registrada")
+        _current_schema_version = version
+    return get_checklist_schema(_current_schema_version)
+
+# NEW: Fragment caching for the checklist markup. The labels, inputs and classes only depend on the
+# schema version, so a fragment template is rendered once per version with slot() markers where the
+# per-report state goes; each request then only joins the cached static parts with those values.
+SLOT_MARKER = '\x00'
+
+def _otro_detail(data, category):
+    text = (data.get(f"{category}_otro_text") or '').strip()
+    if not text:
+        return ''
+    checked = data.get(f"{category}_otro_checkbox")
+    return Markup('<li class="{} mb-1">Otro ({}): {} - {}</li>').format(
+        'text-success' if checked else 'text-danger', category, 'Sí' if checked else 'No', text
+    )
+
+SLOT_RENDERERS = {
+    'state_bg': lambda data, key: 'bg-green-100' if data.get(key) else 'bg-red-100',
+    'checked': lambda data, key: 'checked' if data.get(key) else '',
+    'hidden_unless': lambda data, key: '' if data.get(key) else 'display: none;',
+    'text': lambda data, key: escape(data.get(key) or ''),
+    'status_class': lambda data, key: 'text-success' if data.get(key) else 'text-danger',
+    'yes_no': lambda data, key: 'Sí' if data.get(key) else 'No',
+    'otro_detail': _otro_detail,
+}
+
+class CachedFragment:
+    """A template rendered once for a schema, split into static parts and per-report slots."""
+
+    def __init__(self, template_name, schema):
+        self.slots = []
+
+        def slot(kind, key):
+            self.slots.append((SLOT_RENDERERS[kind], key))
+            return Markup(SLOT_MARKER)
+
+        rendered = render_template(template_name, checklist_items=schema.items, slot=slot)
+        self.parts = rendered.split(SLOT_MARKER)
+
+    def render(self, data):
+        output = [self.parts[0]]
+        for (renderer, key), part in zip(self.slots, self.parts[1:]):
+            output.append(str(renderer(data, key)))
+            output.append(part)
+        return Markup(''.join(output))
+
+# Fragments by (template, schema version); like the schemas, they never change once built
+_fragment_cache = {}
+
+def render_checklist_fragment(template_name, schema, data):
+    fragment = _fragment_cache.get((template_name, schema.version))
+    if fragment is None:
+        fragment = _fragment_cache[(template_name, schema.version)] = CachedFragment(template_name, schema)
+    return fragment.render(data)
+
+# NEW: Columns of the report_changes journal (besides seq), in trigger order
+REPORT_CHANGE_COLUMNS = 'op, changed_at, report_id, hospital_id, date, checklist_data, observations, met_goal, operations_performed, submitted_by, submitted_at, schema_version'
+
+def get_journal_bounds(conn):
+    """(oldest seq still in report_changes, last seq assigned). Older rows were trimmed after a backup."""
+    last = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'report_changes'").fetchone()
+    last = last[0] if last else 0
+    first = conn.execute('SELECT MIN(seq) FROM report_changes').fetchone()[0]
+    return (last + 1 if first is None else first), last
+
+# NEW: Report persistence shared by the checklist form, the JSON API and bulk import
+UPSERT_REPORT_SQL = '''
+    INSERT INTO reports (
+        hospital_id, date, checklist_data, observations, met_goal, operations_performed, submitted_by, submitted_at, schema_version
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (hospital_id, date) DO UPDATE SET
+        checklist_data = excluded.checklist_data,
+        observations = excluded.observations,
+        met_goal = excluded.met_goal,
+        operations_performed = excluded.operations_performed,
+        submitted_at = excluded.submitted_at,
+        schema_version = excluded.schema_version
+'''
+
+def save_report(db, hospital_id, report_date, checklist_data, observations, met_goal, operations_performed, submitted_by, schema):
+    """Inserts or updates a hospital's report for a date (without committing).
+
+    Returns 'inserted' or 'updated'.
+    """
+    existing_report = db.execute(
+        'SELECT id FROM reports WHERE hospital_id = ? AND date = ?',
+        (hospital_id, report_date)
+    ).fetchone()
+    db.execute(UPSERT_REPORT_SQL, (
+        hospital_id,
+        report_date,
+        json.dumps(checklist_data),
+        observations,
+        met_goal,
+        operations_performed,
+        submitted_by,
+        datetime.now().isoformat(),
+        schema.version
+    ))
+    update_problem_streaks(db, hospital_id, report_date, checklist_data, schema)
+    reconcile_alerts(db, [(hospital_id, report_date)])
+    return 'updated' if existing_report else 'inserted'
+
+# NEW: Recurring-problem streaks. Each report advances the streak of every item of its hospital, so
+# "which items have been unchecked for N consecutive days" is an indexed lookup instead of a rescan.
+PROBLEM_STREAK_MIN_DAYS = 3
+
+UPSERT_STREAK_SQL = '''
+    INSERT INTO problem_streaks (
+        hospital_id, item, current_streak, streak_start, last_seen, longest_streak, longest_end, updated_through
+    ) VALUES (:hospital_id, :item, :current_streak, :streak_start, :last_seen, :longest_streak, :longest_end, :updated_through)
+    ON CONFLICT (hospital_id, item) DO UPDATE SET
+        current_streak = excluded.current_streak,
+        streak_start = excluded.streak_start,
+        last_seen = excluded.last_seen,
+        longest_streak = excluded.longest_streak,
+        longest_end = excluded.longest_end,
+        updated_through = excluded.updated_through
+'''
+
+def new_streak(hospital_id, item):
+    return {
+        'hospital_id': hospital_id, 'item': item, 'current_streak': 0, 'streak_start': None,
+        'last_seen': None, 'longest_streak': 0, 'longest_end': None, 'updated_through': None
+    }
+
+def _previous_day(date_str):
+    return format_date(datetime.strptime(date_str, '%Y-%m-%d') - timedelta(days=1))
+
+def _extend_streak(streak, report_date):
+    if streak['last_seen'] is not None and streak['last_seen'] == _previous_day(report_date):
+        streak['current_streak'] += 1
+    else:
+        streak['current_streak'] = 1
+        streak['streak_start'] = report_date
+    streak['last_seen'] = report_date
+    if streak['current_streak'] > streak['longest_streak']:
+        streak['longest_streak'] = streak['current_streak']
+        streak['longest_end'] = report_date
+
+def advance_streak(streak, report_date, unchecked):
+    """Applies one report to an item's streak.
+
+    Reports must arrive in date order; applying the latest date again (a corrected
+    report) replaces the effect of its previous version.
+    """
+    if streak['updated_through'] == report_date:
+        if unchecked and streak['last_seen'] != report_date:
+            _extend_streak(streak, report_date)
+        elif not unchecked and streak['last_seen'] == report_date:
+            # The replaced version of the report had the item unchecked
+            if streak['longest_end'] == report_date:
+                streak['longest_streak'] -= 1
+                streak['longest_end'] = _previous_day(report_date) if streak['longest_streak'] else None
+            streak['current_streak'] -= 1
+            if streak['current_streak']:
+                streak['last_seen'] = _previous_day(report_date)
+            else:
+                streak['streak_start'] = streak['last_seen'] = None
+    elif unchecked:
+        _extend_streak(streak, report_date)
+    streak['updated_through'] = report_date
+
+def update_problem_streaks(db, hospital_id, report_date, checklist_data, schema):
+    """Advances a hospital's streaks with a saved report (without committing)."""
+    streaks = {
+        row['item']: dict(row)
+        for row in db.execute('SELECT * FROM problem_streaks WHERE hospital_id = ?', (hospital_id,))
+    }
+    updated_through = max((streak['updated_through'] or '' for streak in streaks.values()), default='')
+    if report_date < updated_through:
+        # A late report (offline queue, bulk import) changes history: replay the hospital's reports
+        rebuild_problem_streaks(db, hospital_id)
+        return
+    for item in schema.item_keys:
+        streak = streaks.get(item) or new_streak(hospital_id, item)
+        advance_streak(streak, report_date, not checklist_data.get(item))
+        streaks[item] = streak
+    db.executemany(UPSERT_STREAK_SQL, [streaks[item] for item in schema.item_keys])
+
+def rebuild_problem_streaks(db, hospital_id):
+    """Recomputes a hospital's streaks from its reports in the live table (without committing).
+
+    Years moved to the archive are not replayed; a longest streak found there earlier is kept.
+    """
+    previous = {
+        row['item']: row
+        for row in db.execute('SELECT item, longest_streak, longest_end FROM problem_streaks WHERE hospital_id = ?', (hospital_id,))
+    }
+    streaks = {}
+    first_date = None
+    for report in db.execute(
+        'SELECT date, checklist_data, schema_version FROM reports WHERE hospital_id = ? ORDER BY date ASC',
+        (hospital_id,)
+    ).fetchall():
+        first_date = first_date or report['date']
+        checklist_data = json.loads(report['checklist_data'])
+        for item in get_checklist_schema(report['schema_version']).item_keys:
+            streak = streaks.setdefault(item, new_streak(hospital_id, item))
+            advance_streak(streak, report['date'], not checklist_data.get(item))
+
+    for item, row in previous.items():
+        archived = row['longest_end'] is not None and (first_date is None or row['longest_end'] < first_date)
+        if archived and item in streaks and row['longest_streak'] > streaks[item]['longest_streak']:
+            streaks[item]['longest_streak'] = row['longest_streak']
+            streaks[item]['longest_end'] = row['longest_end']
+
+    db.execute('DELETE FROM problem_streaks WHERE hospital_id = ?', (hospital_id,))
+    db.executemany(UPSERT_STREAK_SQL, list(streaks.values()))
+
+# NEW: Compliance alerts. At each cut-off in ALERT_CUTOFF_TIMES the hospitals without a report get a
+# 'missed' alert; the last cut-off closes the day, adding 'below_goal' alerts and the compliance counts.
+ALERT_KINDS = {
+    'missed': 'Reporte no enviado',
+    'below_goal': 'Meta no cumplida'
+}
+ALERT_DASHBOARD_DAYS = 7
+ALERT_HISTORY_LIMIT = 500
+
+def _alert_cutoffs():
+    return sorted(datetime.strptime(cutoff, '%H:%M').time() for cutoff in app.config['ALERT_CUTOFF_TIMES'])
+
+def _add_missed_alerts(db, report_date, detail, now):
+    reported = {row['hospital_id'] for row in db.execute('SELECT hospital_id FROM reports WHERE date = ?', (report_date,))}
+    db.executemany(
+        'INSERT OR IGNORE INTO alerts (hospital_id, date, kind, detail, created_at) VALUES (?, ?, ?, ?, ?)',
+        [
+            (hospital_id, report_date, 'missed', detail, now.isoformat())
+            for hospital_id in HOSPITAL_NAMES if hospital_id not in reported
+        ]
+    )
+
+def run_alert_checks(db, now=None):
+    """Writes the alerts due at now and closes every day whose last cut-off has passed.
+
+    Days missed while the job was not running are caught up; on the first run the
+    evaluation starts at the earliest report. Returns the dates closed.
+    """
+    now = now or datetime.now()
+    cutoffs = _alert_cutoffs()
+    today = now.date()
+    last_closed_day = today if now.time() >= cutoffs[-1] else today - timedelta(days=1)
+
+    last_evaluated = db.execute('SELECT MIN(last_evaluated_date) FROM hospital_compliance').fetchone()[0]
+    if last_evaluated:
+        first_day = datetime.strptime(last_evaluated, '%Y-%m-%d').date() + timedelta(days=1)
+    else:
+        first_report = db.execute('SELECT MIN(date) FROM reports').fetchone()[0]
+        first_day = datetime.strptime(first_report, '%Y-%m-%d').date() if first_report else last_closed_day
+
+    closed = []
+    day = first_day
+    while day <= last_closed_day:
+        report_date = format_date(day)
+        _add_missed_alerts(db, report_date, 'Sin reporte al cierre del día', now)
+        db.execute('''
+            INSERT OR IGNORE INTO alerts (hospital_id, date, kind, detail, created_at)
+            SELECT hospital_id, date, 'below_goal', COALESCE(operations_performed, 0) || ' de ' || ? || ' operaciones', ?
+            FROM reports WHERE date = ? AND met_goal = 0
+        ''', (OPERATIONS_PER_DAY, now.isoformat(), report_date))
+        db.executemany('''
+            INSERT INTO hospital_compliance (hospital_id, days_evaluated, last_evaluated_date) VALUES (?, 1, ?)
+            ON CONFLICT (hospital_id) DO UPDATE SET
+                days_evaluated = days_evaluated + 1,
+                last_evaluated_date = excluded.last_evaluated_date
+            WHERE last_evaluated_date IS NULL OR last_evaluated_date < excluded.last_evaluated_date
+        ''', [(hospital_id, report_date) for hospital_id in HOSPITAL_NAMES])
+        closed.append(report_date)
+        day += timedelta(days=1)
+
+    # Earlier cut-offs of the current day only flag the hospitals that are late so far
+    if last_closed_day < today and now.time() >= cutoffs[0]:
+        _add_missed_alerts(db, format_date(today), f"Sin reporte a las {now.strftime('%H:%M')}", now)
+
+    refresh_hospital_compliance(db)
+    db.commit()
+    return closed
+
+def reconcile_alerts(db, keys):
+    """Updates alerts for reports saved after their day was checked (without committing).
+
+    keys are the (hospital_id, date) pairs whose report was saved, corrected or deleted. A late
+    report resolves its 'missed' alert; a corrected report opens or resolves its 'below_goal'
+    alert. Only those pairs are looked at: the reports of archived years are no longer in the
+    live table, and their alerts must not be resolved as if the reports had been deleted.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    now = datetime.now().isoformat()
+
+    resolved = db.executemany('''
+        UPDATE alerts SET resolved_at = ?
+        WHERE hospital_id = ? AND date = ? AND kind = 'missed' AND resolved_at IS NULL
+            AND EXISTS (SELECT 1 FROM reports r WHERE r.hospital_id = alerts.hospital_id AND r.date = alerts.date)
+    ''', [(now, *key) for key in keys]).rowcount
+    resolved += db.executemany('''
+        UPDATE alerts SET resolved_at = ?
+        WHERE hospital_id = ? AND date = ? AND kind = 'below_goal' AND resolved_at IS NULL
+            AND NOT EXISTS (SELECT 1 FROM reports r WHERE r.hospital_id = alerts.hospital_id AND r.date = alerts.date AND r.met_goal = 0)
+    ''', [(now, *key) for key in keys]).rowcount
+    reopened = db.executemany('''
+        UPDATE alerts SET resolved_at = NULL
+        WHERE hospital_id = ? AND date = ? AND kind = 'below_goal' AND resolved_at IS NOT NULL
+            AND EXISTS (SELECT 1 FROM reports r WHERE r.hospital_id = alerts.hospital_id AND r.date = alerts.date AND r.met_goal = 0)
+    ''', keys).rowcount
+    added = db.executemany('''
+        INSERT OR IGNORE INTO alerts (hospital_id, date, kind, detail, created_at)
+        SELECT r.hospital_id, r.date, 'below_goal', COALESCE(r.operations_performed, 0) || ' de ' || ? || ' operaciones', ?
+        FROM reports r JOIN hospital_compliance c ON c.hospital_id = r.hospital_id
+        WHERE r.hospital_id = ? AND r.date = ? AND r.met_goal = 0 AND r.date <= c.last_evaluated_date
+    ''', [(OPERATIONS_PER_DAY, now, *key) for key in keys]).rowcount
+    if resolved or reopened or added:
+        refresh_hospital_compliance(db)
+
+def refresh_hospital_compliance(db):
+    """Recounts the open alerts of the closed days into hospital_compliance (a few indexed counts)."""
+    db.execute('''
+        UPDATE hospital_compliance SET
+            days_missed = (
+                SELECT COUNT(*) FROM alerts a
+                WHERE a.hospital_id = hospital_compliance.hospital_id AND a.kind = 'missed'
+                    AND a.resolved_at IS NULL AND a.date <= hospital_compliance.last_evaluated_date
+            ),
+            days_below_goal = (
+                SELECT COUNT(*) FROM alerts a
+                WHERE a.hospital_id = hospital_compliance.hospital_id AND a.kind = 'below_goal'
+                    AND a.resolved_at IS NULL AND a.date <= hospital_compliance.last_evaluated_date
+            )
+    ''')
+    db.execute('UPDATE hospital_compliance SET days_reported = days_evaluated - days_missed')
+
+# NEW: Login hardening. Password hashes are checked in a small process pool so a burst of logins
+# cannot occupy every request thread, and repeated failures are rejected before any hash work.
+LOGIN_HASH_WORKERS = max(1, (os.cpu_count() or 1) // 2)
+LOGIN_MAX_PENDING = LOGIN_HASH_WORKERS * 8 # Verifications queued or running; beyond this logins get a 503
+LOGIN_HASH_TIMEOUT = 10 # Seconds
+LOGIN_FAILURE_WINDOW = 15 * 60 # Seconds
+LOGIN_LIMITER_MAX_KEYS = 10000
+
+_login_pool = None
+_login_slots = BoundedSemaphore(LOGIN_MAX_PENDING)
+
+def get_login_pool():
+    global _login_pool
+    if _login_pool is None:
+        _login_pool = ProcessPoolExecutor(max_workers=LOGIN_HASH_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _login_pool
+
+# Hash prefix Werkzeug writes for each configured method ('scrypt' -> 'scrypt:32768:8:1', ...)
+_hash_method_prefixes = {}
+
+def get_hash_method_prefix(hash_method):
+    """Prefix of the hashes generated with hash_method, worked out once from a sample hash."""
+    prefix = _hash_method_prefixes.get(hash_method)
+    if prefix is None:
+        prefix = _hash_method_prefixes[hash_method] = generate_password_hash('', method=hash_method).split('$', 1)[0]
+    return prefix
+
+def _verify_password_worker(password_hash, password, hash_method, hash_prefix):
+    """Process pool entry point: checks a password and, if valid, rehashes it when the policy changed.
+
+    Returns (valid, new hash or None).
+    """
+    if not check_password_hash(password_hash, password):
+        return False, None
+    if password_hash.split('$', 1)[0] != hash_prefix:
+        return True, generate_password_hash(password, method=hash_method)
+    return True, None
+
+def verify_password(password_hash, password):
+    """Runs _verify_password_worker in the login pool. Returns None when the pool is saturated."""
+    global _login_pool
+    hash_method = app.config['PASSWORD_HASH_METHOD']
+    hash_prefix = get_hash_method_prefix(hash_method)
+    if not _login_slots.acquire(timeout=LOGIN_HASH_TIMEOUT):
+        return None
+    try:
+        future = get_login_pool().submit(_verify_password_worker, password_hash, password, hash_method, hash_prefix)
+    except BrokenProcessPool:
+        _login_slots.release()
+        _login_pool = None
+        return None
+    # The slot is held until the hash finishes, even if this request stops waiting for it
+    future.add_done_callback(lambda future: _login_slots.release())
+    try:
+        return future.result(timeout=LOGIN_HASH_TIMEOUT)
+    except FutureTimeoutError:
+        return None
+    except BrokenProcessPool:
+        _login_pool = None
+        return None
+
+class LoginFailureLimiter:
+    """Counts recent failed logins per username and per IP in memory (per worker process)."""
+
+    def __init__(self, window, max_keys):
+        self.window = window
+        self.max_keys = max_keys
+        self.failures = {}
+        self.lock = Lock()
+
+    @property
+    def limits(self):
+        return {'user': app.config['LOGIN_MAX_FAILURES_PER_USER'], 'ip': app.config['LOGIN_MAX_FAILURES_PER_IP']}
+
+    def _recent(self, key, now):
+        attempts = self.failures.get(key)
+        if attempts is None:
+            return None
+        while attempts and attempts[0] <= now - self.window:
+            attempts.popleft()
+        if not attempts:
+            del self.failures[key]
+            return None
+        return attempts
+
+    def is_blocked(self, username, ip_address):
+        now = time.monotonic()
+        limits = self.limits
+        with self.lock:
+            for kind, value in (('user', username), ('ip', ip_address)):
+                attempts = self._recent((kind, value), now)
+                if attempts is not None and len(attempts) >= limits[kind]:
+                    return True
+        return False
+
+    def add_failure(self, username, ip_address):
+        """Records a failure. Returns True if it is the one that blocks the username or IP."""
+        now = time.monotonic()
+        blocked = False
+        limits = self.limits
+        with self.lock:
+            if len(self.failures) >= self.max_keys:
+                # Drop the key whose last failure is the oldest
+                del self.failures[min(self.failures, key=lambda key: self.failures[key][-1])]
+            for kind, value in (('user', username), ('ip', ip_address)):
+                attempts = self._recent((kind, value), now)
+                if attempts is None:
+                    attempts = self.failures[(kind, value)] = deque()
+                attempts.append(now)
+                blocked = blocked or len(attempts) == limits[kind]
+        return blocked
+
+    def reset(self, username):
+        with self.lock:
+            self.failures.pop(('user', username), None)
+
+login_limiter = LoginFailureLimiter(LOGIN_FAILURE_WINDOW, LOGIN_LIMITER_MAX_KEYS)
 
 # Routes
 @app.route('/', methods=['GET', 'POST'])
@@ -140,11 +1279,26 @@ def login():
         username = request.form.get('username')
         password = request.form.get('password')
         user_ip = request.remote_addr # Get user's IP address
+
+        # NEW: Rejected without touching the database or hashing while the limit is exceeded
+        if login_limiter.is_blocked(username, user_ip):
+            flash('Demasiados intentos fallidos. Intente de nuevo en unos minutos.', 'error')
+            return render_template('login.html', hospital_names=HOSPITAL_NAMES), 429
         
         db = get_db()
         user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
+
+        verification = verify_password(user['password'], password or '') if user else (False, None)
+        if verification is None:
+            flash('El servidor está ocupado. Intente de nuevo en unos segundos.', 'error')
+            return render_template('login.html', hospital_names=HOSPITAL_NAMES), 503
+        valid, new_hash = verification
         
-        if user and check_password_hash(user['password'], password):
+        if valid:
+            login_limiter.reset(username)
+            if new_hash:
+                # NEW: Transparent upgrade to the current PASSWORD_HASH_METHOD (committed by log_action below)
+                db.execute('UPDATE users SET password = ? WHERE id = ?', (new_hash, user['id']))
             session['user_id'] = user['id']
             session['username'] = user['username']
             session['role'] = user['role']
@@ -157,8 +1311,10 @@ def login():
                 return redirect(url_for('hospital_checklist'))
         else:
             flash('Usuario o contraseña incorrectos.', 'error')
-            # Log failed login attempt (user_id is None since login failed)
-            log_action(None, f'failed login attempt for username: {username}', user_ip)
+            # Log failed login attempt (user_id is None since login failed); written in batches
+            defer_log_action(None, f'failed login attempt for username: {username}', user_ip)
+            if login_limiter.add_failure(username, user_ip):
+                defer_log_action(None, f'login temporarily blocked for username: {username}', user_ip)
     
     return render_template('login.html', hospital_names=HOSPITAL_NAMES)
 
@@ -185,260 +1341,34 @@ def hospital_checklist():
     
     if request.method == 'POST':
         # Process form submission
-        checklist_data = {}
-        for category, items in CHECKLIST_ITEMS.items():
-            for item in items:
-                checklist_data[item] = request.form.get(item) == 'on'
-            # Handle 'Otro' checkbox and text
-            otro_checkbox_name = f"{category}_otro_checkbox"
-            otro_text_name = f"{category}_otro_text"
-            checklist_data[otro_checkbox_name] = request.form.get(otro_checkbox_name) == 'on'
-            checklist_data[otro_text_name] = request.form.get(otro_text_name, '')
+        schema = get_current_checklist_schema()
+        checklist_data = schema.parse_form(request.form)
         
         observations = request.form.get('observations', '')
-        met_goal_str = request.form.get('met_goal')
-        
-        operations_performed = None
-        if met_goal_str is None:
-            flash('Por favor, indique si se cumplió con la meta.', 'error')
-            # Re-render form with existing data to show error
-            report = db.execute(
-                'SELECT * FROM reports WHERE hospital_id = ? AND date = ?',
-                (hospital_id, today)
-            ).fetchone()
-            if report:
-                checklist_data = json.loads(report['checklist_data'])
-                observations = report['observations'] or ''
-                met_goal = report['met_goal']
-                operations_performed = report['operations_performed']
-            else:
-                checklist_data = get_default_checklist()
-                observations = ''
-                met_goal = None
-                operations_performed = None
-            
-            # Calculate unit percentage for re-render
-            total_items = 0
-            checked_items_count = 0
-            for category, items in CHECKLIST_ITEMS.items():
-                for item in items:
-                    total_items += 1
-                    if checklist_data.get(item):
-                        checked_items_count += 1
-                
-                otro_checkbox_name = f"{category}_otro_checkbox"
-                otro_text_name = f"{category}_otro_text"
-                
-                if checklist_data.get(otro_text_name):
-                    total_items += 1
-                    if checklist_data.get(otro_checkbox_name):
-                        checked_items_count += 1
-
-            unit_percentage = (checked_items_count / total_items) * 100 if total_items > 0 else 0
-
-            return render_template(
-                'checklist.html',
-                hospital_name=HOSPITAL_NAMES.get(hospital_id, hospital_id),
-                today=today,
-                checklist_items=CHECKLIST_ITEMS,
-                checklist_data=checklist_data,
-                observations=observations,
-                met_goal=met_goal,
-                operations_performed=operations_performed,
-                unit_percentage=unit_percentage
-            )
-
+        met_goal, operations_performed, error = validate_report_fields(
+            request.form.get('met_goal'), request.form.get('operations_performed')
+        )
 
-        met_goal = met_goal_str == 'true'
-
-        if not met_goal:
-            operations_str = request.form.get('operations_performed')
-            if not operations_str:
-                flash('Por favor, ingrese el número de operaciones realizadas si la meta no se cumplió.', 'error')
-                report = db.execute(
-                    'SELECT * FROM reports WHERE hospital_id = ? AND date = ?',
-                    (hospital_id, today)
-                ).fetchone()
-                if report:
-                    checklist_data = json.loads(report['checklist_data'])
-                    observations = report['observations'] or ''
-                    met_goal = report['met_goal']
-                    operations_performed = report['operations_performed']
-                else:
-                    checklist_data = get_default_checklist()
-                    observations = ''
-                    met_goal = None
-                    operations_performed = None
-
-                total_items = 0
-                checked_items_count = 0
-                for category, items in CHECKLIST_ITEMS.items():
-                    for item in items:
-                        total_items += 1
-                        if checklist_data.get(item):
-                            checked_items_count += 1
-                    
-                    otro_checkbox_name = f"{category}_otro_checkbox"
-                    otro_text_name = f"{category}_otro_text"
-                    
-                    if checklist_data.get(otro_text_name):
-                        total_items += 1
-                        if checklist_data.get(otro_checkbox_name):
-                            checked_items_count += 1
-
-                unit_percentage = (checked_items_count / total_items) * 100 if total_items > 0 else 0
-
-                return render_template(
-                    'checklist.html',
-                    hospital_name=HOSPITAL_NAMES.get(hospital_id, hospital_id),
-                    today=today,
-                    checklist_items=CHECKLIST_ITEMS,
-                    checklist_data=checklist_data,
-                    observations=observations,
-                    met_goal=met_goal,
-                    operations_performed=operations_performed,
-                    unit_percentage=unit_percentage
-                )
+        if error:
+            # Re-render form with the stored report to show the error
+            flash(error, 'error')
+        else:
             try:
-                operations_performed = int(operations_str)
-                if operations_performed > 7 or operations_performed < 0:
-                    flash('El número de operaciones no puede ser mayor a 7 ni negativo.', 'error')
-                    report = db.execute(
-                        'SELECT * FROM reports WHERE hospital_id = ? AND date = ?',
-                        (hospital_id, today)
-                    ).fetchone()
-                    if report:
-                        checklist_data = json.loads(report['checklist_data'])
-                        observations = report['observations'] or ''
-                        met_goal = report['met_goal']
-                        operations_performed = report['operations_performed']
-                    else:
-                        checklist_data = get_default_checklist()
-                        observations = ''
-                        met_goal = None
-                        operations_performed = None
-
-                    total_items = 0
-                    checked_items_count = 0
-                    for category, items in CHECKLIST_ITEMS.items():
-                        for item in items:
-                            total_items += 1
-                            if checklist_data.get(item):
-                                checked_items_count += 1
-                        
-                        otro_checkbox_name = f"{category}_otro_checkbox"
-                        otro_text_name = f"{category}_otro_text"
-                        
-                        if checklist_data.get(otro_text_name):
-                            total_items += 1
-                            if checklist_data.get(otro_checkbox_name):
-                                checked_items_count += 1
-
-                    unit_percentage = (checked_items_count / total_items) * 100 if total_items > 0 else 0
-
-                    return render_template(
-                        'checklist.html',
-                        hospital_name=HOSPITAL_NAMES.get(hospital_id, hospital_id),
-                        today=today,
-                        checklist_items=CHECKLIST_ITEMS,
-                        checklist_data=checklist_data,
-                        observations=observations,
-                        met_goal=met_goal,
-                        operations_performed=operations_performed,
-                        unit_percentage=unit_percentage
-                    )
-            except ValueError:
-                flash('El número de operaciones debe ser un valor numérico.', 'error')
-                report = db.execute(
-                    'SELECT * FROM reports WHERE hospital_id = ? AND date = ?',
-                    (hospital_id, today)
-                ).fetchone()
-                if report:
-                    checklist_data = json.loads(report['checklist_data'])
-                    observations = report['observations'] or ''
-                    met_goal = report['met_goal']
-                    operations_performed = report['operations_performed']
-                else:
-                    checklist_data = get_default_checklist()
-                    observations = ''
-                    met_goal = None
-                    operations_performed = None
-
-                total_items = 0
-                checked_items_count = 0
-                for category, items in CHECKLIST_ITEMS.items():
-                    for item in items:
-                        total_items += 1
-                        if checklist_data.get(item):
-                            checked_items_count += 1
-                    
-                    otro_checkbox_name = f"{category}_otro_checkbox"
-                    otro_text_name = f"{category}_otro_text"
-                    
-                    if checklist_data.get(otro_text_name):
-                        total_items += 1
-                        if checklist_data.get(otro_checkbox_name):
-                            checked_items_count += 1
-
-                unit_percentage = (checked_items_count / total_items) * 100 if total_items > 0 else 0
-
-                return render_template(
-                    'checklist.html',
-                    hospital_name=HOSPITAL_NAMES.get(hospital_id, hospital_id),
-                    today=today,
-                    checklist_items=CHECKLIST_ITEMS,
-                    checklist_data=checklist_data,
-                    observations=observations,
-                    met_goal=met_goal,
-                    operations_performed=operations_performed,
-                    unit_percentage=unit_percentage
+                status = save_report(
+                    db, hospital_id, today, checklist_data, observations,
+                    met_goal, operations_performed, user_id, schema
                 )
-        
-        try:
-            checklist_data_json = json.dumps(checklist_data)
-
-            existing_report = db.execute(
-                'SELECT id FROM reports WHERE hospital_id = ? AND date = ?',
-                (hospital_id, today)
-            ).fetchone()
-            
-            if existing_report:
-                db.execute('''
-                    UPDATE reports 
-                    SET checklist_data = ?, observations = ?, met_goal = ?, operations_performed = ?, submitted_at = ?
-                    WHERE id = ?
-                ''', (
-                    checklist_data_json,
-                    observations,
-                    met_goal,
-                    operations_performed,
-                    datetime.now().isoformat(),
-                    existing_report['id']
-                ))
-                log_action(user_id, f'updated daily report for {hospital_id} on {today}', user_ip) # Log update
-            else:
-                db.execute('''
-                    INSERT INTO reports (
-                        hospital_id, date, checklist_data, observations, met_goal, operations_performed, submitted_by, submitted_at
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    hospital_id,
-                    today,
-                    checklist_data_json,
-                    observations,
-                    met_goal,
-                    operations_performed,
-                    session['user_id'],
-                    datetime.now().isoformat()
-                ))
-                log_action(user_id, f'submitted daily report for {hospital_id} on {today}', user_ip) # Log submission
-            
-            db.commit()
-            flash('¡Reporte guardado exitosamente!', 'success')
-        except Exception as e:
-            db.rollback()
-            flash(f'Error al guardar el reporte: {e}. Intente de nuevo.', 'error')
-            log_action(user_id, f'error saving report for {hospital_id} on {today}: {e}', user_ip) # Log error
+                if status == 'updated':
+                    log_action(user_id, f'updated daily report for {hospital_id} on {today}', user_ip) # Log update
+                else:
+                    log_action(user_id, f'submitted daily report for {hospital_id} on {today}', user_ip) # Log submission
+
+                db.commit()
+                flash('¡Reporte guardado exitosamente!', 'success')
+            except Exception as e:
+                db.rollback()
+                flash(f'Error al guardar el reporte: {e}. Intente de nuevo.', 'error')
+                log_action(user_id, f'error saving report for {hospital_id} on {today}: {e}', user_ip) # Log error
     
     report = db.execute(
         'SELECT * FROM reports WHERE hospital_id = ? AND date = ?',
@@ -447,45 +1377,142 @@ def hospital_checklist():
     
     if report:
         checklist_data = json.loads(report['checklist_data'])
+        schema_version = report['schema_version']
         observations = report['observations'] or ''
         met_goal = report['met_goal']
         operations_performed = report['operations_performed']
     else:
         checklist_data = get_default_checklist()
+        schema_version = None
         observations = ''
         met_goal = None
         operations_performed = None
 
-    total_items = 0
-    checked_items_count = 0
-    for category, items in CHECKLIST_ITEMS.items():
-        for item in items:
-            total_items += 1
-            if checklist_data.get(item):
-                checked_items_count += 1
-        
-        otro_checkbox_name = f"{category}_otro_checkbox"
-        otro_text_name = f"{category}_otro_text"
-        
-        if checklist_data.get(otro_text_name) and checklist_data[otro_text_name].strip() != '':
-            total_items += 1
-            if checklist_data.get(otro_checkbox_name):
-                checked_items_count += 1
-    
-    unit_percentage = (checked_items_count / total_items) * 100 if total_items > 0 else 0
+    unit_percentage = get_checklist_schema(schema_version).unit_percentage(checklist_data)
+    schema = get_current_checklist_schema()
     
     return render_template(
         'checklist.html',
         hospital_name=HOSPITAL_NAMES.get(hospital_id, hospital_id),
         today=today,
-        checklist_items=CHECKLIST_ITEMS,
-        checklist_data=checklist_data,
+        checklist_items=schema.items,
+        checklist_form_items=render_checklist_fragment('checklist_items_fragment.html', schema, checklist_data),
         observations=observations,
         met_goal=met_goal,
         operations_performed=operations_performed,
         unit_percentage=unit_percentage
     )
 
+# NEW: JSON submission API with idempotency keys (used by the offline queue in checklist.html)
+IDEMPOTENCY_MAX_KEYS = 10000
+IDEMPOTENCY_KEY_TTL = timedelta(hours=48)
+OFFLINE_SUBMISSION_MAX_DAYS = 7 # Queued reports may arrive a few days after they were filled in
+
+def get_idempotent_response(db, user_id, key):
+    row = db.execute(
+        'SELECT status_code, response FROM idempotency_keys WHERE user_id = ? AND key = ?',
+        (user_id, key)
+    ).fetchone()
+    if row is None:
+        return None
+    response = app.response_class(row['response'], status=row['status_code'], mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def store_idempotent_response(db, user_id, key, status_code, body):
+    """Records a response (within the caller's transaction) and keeps the store bounded."""
+    db.execute(
+        'INSERT INTO idempotency_keys (user_id, key, status_code, response, created_at) VALUES (?, ?, ?, ?, ?)',
+        (user_id, key, status_code, json.dumps(body), datetime.now().isoformat())
+    )
+    db.execute(
+        'DELETE FROM idempotency_keys WHERE created_at < ? OR rowid <= (SELECT MAX(rowid) FROM idempotency_keys) - ?',
+        ((datetime.now() - IDEMPOTENCY_KEY_TTL).isoformat(), IDEMPOTENCY_MAX_KEYS)
+    )
+
+@app.route('/api/checklist', methods=['POST'])
+def api_checklist():
+    """Saves the hospital's checklist from a JSON body.
+
+    Requests carrying an Idempotency-Key header (or "idempotency_key" field) are
+    processed once; retries get the stored response back.
+    """
+    if 'user_id' not in session or session['role'] != 'hospital':
+        return jsonify({'errors': {'session': 'Sesión expirada. Inicie sesión nuevamente.'}}), 401
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return jsonify({'errors': {'body': 'Se esperaba un objeto JSON.'}}), 400
+
+    hospital_id = session['hospital_id']
+    user_id = session['user_id']
+    user_ip = request.remote_addr
+    db = get_db()
+
+    key = request.headers.get('Idempotency-Key') or payload.get('idempotency_key')
+    if key:
+        key = str(key)[:128]
+        replayed = get_idempotent_response(db, user_id, key)
+        if replayed is not None:
+            return replayed
+
+    today = format_date()
+    errors = {}
+    report_date = str(payload.get('date') or today)
+    try:
+        parsed_date = datetime.strptime(report_date, '%Y-%m-%d')
+        report_date = format_date(parsed_date)
+        if report_date > today or parsed_date < datetime.strptime(today, '%Y-%m-%d') - timedelta(days=OFFLINE_SUBMISSION_MAX_DAYS):
+            errors['date'] = f'La fecha debe estar entre hoy y los últimos {OFFLINE_SUBMISSION_MAX_DAYS} días.'
+    except ValueError:
+        errors['date'] = 'Formato de fecha inválido. Use AAAA-MM-DD.'
+
+    met_goal_value = payload.get('met_goal')
+    if isinstance(met_goal_value, bool):
+        met_goal_value = 'true' if met_goal_value else 'false'
+    met_goal, operations_performed, error = validate_report_fields(met_goal_value, payload.get('operations_performed'))
+    if error:
+        errors['met_goal' if met_goal is None else 'operations_performed'] = error
+
+    if errors:
+        return jsonify({'errors': errors}), 422
+
+    schema = get_current_checklist_schema()
+    checklist_data = payload.get('checklist_data')
+    checklist_data = schema.parse_record(checklist_data if isinstance(checklist_data, dict) else {})
+    observations = str(payload.get('observations') or '')
+
+    try:
+        status = save_report(
+            db, hospital_id, report_date, checklist_data, observations,
+            met_goal, operations_performed, user_id, schema
+        )
+        body = {
+            'status': status,
+            'hospital_id': hospital_id,
+            'date': report_date,
+            'unit_percentage': round(schema.unit_percentage(checklist_data), 1)
+        }
+        status_code = 201 if status == 'inserted' else 200
+        if key:
+            store_idempotent_response(db, user_id, key, status_code, body)
+        db.commit()
+    except sqlite3.IntegrityError:
+        # A concurrent retry with the same key committed first
+        db.rollback()
+        replayed = get_idempotent_response(db, user_id, key) if key else None
+        if replayed is not None:
+            return replayed
+        raise
+    except sqlite3.Error as e:
+        db.rollback()
+        log_action(user_id, f'error saving report for {hospital_id} on {report_date}: {e}', user_ip)
+        return jsonify({'errors': {'server': 'Error al guardar el reporte. Intente de nuevo.'}}), 503
+
+    verb = 'updated' if status == 'updated' else 'submitted'
+    log_action(user_id, f'{verb} daily report for {hospital_id} on {report_date} (api)', user_ip)
+    return jsonify(body), status_code
+
 @app.route('/dashboard')
 def dashboard():
     if 'user_id' not in session or session['role'] != 'admin':
@@ -505,12 +1532,37 @@ def dashboard():
         'SELECT * FROM reports WHERE date = ?', (today_str,)
     ).fetchall()
 
-    submitted_hospitals = {r['hospital_id'] for r in daily_reports}
-    
-    missing_reports = []
-    for hospital_id in HOSPITAL_NAMES:
-        if hospital_id not in submitted_hospitals:
-            missing_reports.append(f"¡Atención! {HOSPITAL_NAMES[hospital_id]} no ha enviado su reporte diario.")
+    # Today's missing reports come from today's reports themselves, so they are shown before the first
+    # cut-off and without the alert scheduler; the alerts table covers the previous days (see run_alert_checks)
+    reported_today = {report['hospital_id'] for report in daily_reports}
+    missing_reports = [
+        f"¡Atención! {hospital_name} no ha enviado su reporte diario."
+        for hospital_id, hospital_name in HOSPITAL_NAMES.items() if hospital_id not in reported_today
+    ]
+    open_alerts = db.execute('''
+        SELECT hospital_id, date, kind, detail FROM alerts
+        WHERE resolved_at IS NULL AND date >= ? AND date < ?
+        ORDER BY date DESC, hospital_id ASC
+    ''', (format_date(today - timedelta(days=ALERT_DASHBOARD_DAYS - 1)), today_str)).fetchall()
+    recent_alerts = [
+        {
+            'hospital_name': HOSPITAL_NAMES.get(alert['hospital_id'], alert['hospital_id']),
+            'date': alert['date'],
+            'kind': ALERT_KINDS.get(alert['kind'], alert['kind']),
+            'detail': alert['detail']
+        }
+        for alert in open_alerts
+    ]
+    hospital_compliance = {
+        row['hospital_id']: {
+            'name': HOSPITAL_NAMES.get(row['hospital_id'], row['hospital_id']),
+            'days_evaluated': row['days_evaluated'],
+            'days_missed': row['days_missed'],
+            'days_below_goal': row['days_below_goal'],
+            'percentage': round(row['days_reported'] / row['days_evaluated'] * 100, 1) if row['days_evaluated'] else 0
+        }
+        for row in db.execute('SELECT * FROM hospital_compliance')
+    }
     
     total_hospitals = len(HOSPITAL_NAMES)
     completed_reports = len(daily_reports)
@@ -582,40 +1634,27 @@ def dashboard():
 
     fortnight_goal_percentage = (total_fortnight_operations / OPERATIONS_PER_FORTNIGHT) * 100 if OPERATIONS_PER_FORTNIGHT > 0 else 0
 
+    # NEW: Summary rows only, from one query; the checklist detail of each hospital is
+    # loaded from hospital_report_detail() when its panel is opened
+    latest_reports = {
+        report['hospital_id']: report for report in db.execute('''
+            SELECT r.hospital_id, r.date, r.checklist_data, r.met_goal, r.operations_performed, r.schema_version
+            FROM reports r
+            JOIN (SELECT hospital_id, MAX(date) AS date FROM reports GROUP BY hospital_id) latest
+                ON latest.hospital_id = r.hospital_id AND latest.date = r.date
+        ''')
+    }
+
     hospital_reports = {}
     for hospital_id in HOSPITAL_NAMES:
-        report = db.execute('''
-            SELECT * FROM reports 
-            WHERE hospital_id = ? 
-            ORDER BY date DESC 
-            LIMIT 1
-        ''', (hospital_id,)).fetchone()
+        report = latest_reports.get(hospital_id)
         
         if report:
-            loaded_checklist_data = json.loads(report['checklist_data'])
-            
-            total_items = 0
-            checked_items_count = 0
-            for category, items in CHECKLIST_ITEMS.items():
-                for item in items:
-                    total_items += 1
-                    if loaded_checklist_data.get(item):
-                        checked_items_count += 1
-                
-                otro_checkbox_name = f"{category}_otro_checkbox"
-                otro_text_name = f"{category}_otro_text"
-                
-                if loaded_checklist_data.get(otro_text_name) and loaded_checklist_data[otro_text_name].strip() != '':
-                    total_items += 1
-                    if loaded_checklist_data.get(otro_checkbox_name):
-                        checked_items_count += 1
-
-            unit_percentage_hospital = (checked_items_count / total_items) * 100 if total_items > 0 else 0
+            schema = get_checklist_schema(report['schema_version'])
+            unit_percentage_hospital = schema.unit_percentage(json.loads(report['checklist_data']))
 
             hospital_reports[hospital_id] = {
                 'date': report['date'],
-                'checklist_data': loaded_checklist_data,
-                'observations': report['observations'] or '',
                 'met_goal': report['met_goal'],
                 'operations_performed': report['operations_performed'],
                 'unit_percentage': unit_percentage_hospital
@@ -623,8 +1662,6 @@ def dashboard():
         else:
             hospital_reports[hospital_id] = {
                 'date': 'N/A',
-                'checklist_data': {},
-                'observations': 'N/A',
                 'met_goal': None,
                 'operations_performed': None,
                 'unit_percentage': 0
@@ -639,12 +1676,13 @@ def dashboard():
         operations_week=OPERATIONS_PER_WEEK,
         operations_day=OPERATIONS_PER_DAY,
         missing_reports=missing_reports,
+        recent_alerts=recent_alerts,
+        hospital_compliance=hospital_compliance,
         progress_percentage=round(progress_percentage, 1),
         progress_status=progress_status,
         completed_reports=completed_reports,
         total_hospitals=total_hospitals,
         hospital_reports=hospital_reports,
-        checklist_items_structure=CHECKLIST_ITEMS,
         total_daily_operations=total_daily_operations,
         total_weekly_operations=total_weekly_operations, # Added for weekly goal
         total_fortnight_operations=total_fortnight_operations,
@@ -653,209 +1691,501 @@ def dashboard():
         hospital_fortnight_operations=hospital_fortnight_operations # NEW: Pass this to the template
     )
 
-@app.route('/statistics', methods=['GET', 'POST'])
-def statistics():
+# NEW: Checklist detail of a hospital's latest report, fetched by the dashboard panels
+@app.route('/api/hospitals/<hospital_id>/latest_report')
+def hospital_report_detail(hospital_id):
     if 'user_id' not in session or session['role'] != 'admin':
-        return redirect(url_for('login'))
-
-    # Optional: Log access to statistics page
-    log_action(session['user_id'], 'accessed statistics page', request.remote_addr)
+        return jsonify({'error': 'No autorizado.'}), 401
+    if hospital_id not in HOSPITAL_NAMES:
+        return jsonify({'error': 'Hospital desconocido.'}), 404
 
     db = get_db()
-    
-    start_date_str = request.form.get('start_date')
-    end_date_str = request.form.get('end_date')
-
-    if not start_date_str or not end_date_str:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=6)
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-    else:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            if start_date > end_date:
-                flash('La fecha de inicio no puede ser posterior a la fecha de fin.', 'error')
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=6)
-                start_date_str = start_date.strftime('%Y-%m-%d')
-                end_date_str = end_date.strftime('%Y-%m-%d')
+    report = db.execute(
+        'SELECT id, date, submitted_at FROM reports WHERE hospital_id = ? ORDER BY date DESC LIMIT 1',
+        (hospital_id,)
+    ).fetchone()
+    if report is None:
+        return jsonify({'error': 'Sin reportes.'}), 404
 
-        except ValueError:
-            flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'error')
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=6)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
-    
-    query = """
-        SELECT hospital_id, date, checklist_data, observations, met_goal, operations_performed
-        FROM reports
-        WHERE date BETWEEN ? AND ?
-        ORDER BY date ASC, hospital_id ASC
-    """
-    raw_reports = db.execute(query, (start_date_str, end_date_str)).fetchall()
+    # The browser revalidates with the ETag; an unchanged report is answered with 304 before decoding it
+    etag = f"{report['id']}-{report['date']}-{report['submitted_at']}"
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        report = db.execute(
+            'SELECT date, checklist_data, observations, schema_version FROM reports WHERE id = ?', (report['id'],)
+        ).fetchone()
+        schema = get_checklist_schema(report['schema_version'])
+        response = jsonify({
+            'hospital_id': hospital_id,
+            'date': report['date'],
+            'checklist_html': render_checklist_fragment(
+                'dashboard_checklist_fragment.html', schema, json.loads(report['checklist_data'])
+            ),
+            'observations': report['observations'] or ''
+        })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
 
-    processed_reports = []
-    daily_total_operations = {}
-    daily_unit_completion = {}
-    # historical_goals_data is now structured for counting 'met goals' per hospital
-    historical_goals_data = {hospital_id: {'labels': [], 'data': []} for hospital_id in HOSPITAL_NAMES.keys()}
-    checklist_item_analysis = {}
+# NEW: Single-pass aggregation for the streamed statistics page
+class StatisticsAggregator:
+    """Computes the /statistics aggregates while the report rows are streamed.
 
-    all_checklist_items = []
-    for category, items in CHECKLIST_ITEMS.items():
-        for item in items:
-            all_checklist_items.append(item)
-        all_checklist_items.append(f"{category}_otro_checkbox")
+    process() yields the rows for the "Resumen Ejecutivo" table; the chart data and
+    item analysis are read by the template after that table has been rendered.
+    """
 
-    for item_name in all_checklist_items:
-        checklist_item_analysis[item_name] = {'checked': 0, 'total': 0}
+    def __init__(self, resolution='auto'):
+        self.resolution = resolution
+        self.daily_total_operations = {}
+        self.daily_unit_completion = {}
+        self.hospital_met_goal_counts = dict.fromkeys(HOSPITAL_NAMES, 0)
+        self.checklist_item_analysis = {
+            item_name: {'checked': 0, 'total': 0} for item_name in get_current_checklist_schema().analysis_keys
+        }
 
+    def process(self, rows):
+        for report in rows:
+            yield self.add(report)
 
-    for report in raw_reports:
+    def add(self, report):
         hospital_id = report['hospital_id']
         report_date = report['date']
         loaded_checklist_data = json.loads(report['checklist_data'])
+        schema = get_checklist_schema(report['schema_version'])
 
-        total_items_report = 0
-        checked_items_count_report = 0
-        for category, items in CHECKLIST_ITEMS.items():
-            for item in items:
-                total_items_report += 1
-                if loaded_checklist_data.get(item):
-                    checked_items_count_report += 1
-            
-            otro_checkbox_name = f"{category}_otro_checkbox"
-            otro_text_name = f"{category}_otro_text"
-            
-            if loaded_checklist_data.get(otro_text_name) and loaded_checklist_data[otro_text_name].strip() != '':
-                total_items_report += 1
-                if loaded_checklist_data.get(otro_checkbox_name):
-                    checked_items_count_report += 1
-
-        unit_percentage = (checked_items_count_report / total_items_report) * 100 if total_items_report > 0 else 0
-
+        unit_percentage = schema.unit_percentage(loaded_checklist_data)
 
         operations_count = report['operations_performed']
         if report['met_goal'] == 1:
             operations_count = OPERATIONS_PER_DAY
 
-        processed_reports.append({
+        if report_date not in self.daily_total_operations:
+            self.daily_total_operations[report_date] = 0
+        if operations_count is not None:
+            self.daily_total_operations[report_date] += operations_count
+
+        if report_date not in self.daily_unit_completion:
+            self.daily_unit_completion[report_date] = {'total_percentage': 0, 'count': 0}
+        self.daily_unit_completion[report_date]['total_percentage'] += unit_percentage
+        self.daily_unit_completion[report_date]['count'] += 1
+
+        if report['met_goal'] == 1:
+            self.hospital_met_goal_counts[hospital_id] = self.hospital_met_goal_counts.get(hospital_id, 0) + 1
+
+        # Items of older schema versions that are no longer in the current checklist get their own row
+        for item_name, checked in schema.item_results(loaded_checklist_data):
+            counts = self.checklist_item_analysis.get(item_name)
+            if counts is None:
+                counts = self.checklist_item_analysis[item_name] = {'checked': 0, 'total': 0}
+            counts['total'] += 1
+            if checked:
+                counts['checked'] += 1
+
+        return {
             'hospital_id': hospital_id,
             'hospital_name': HOSPITAL_NAMES.get(hospital_id, hospital_id),
             'date': report_date,
             'met_goal': report['met_goal'],
             'operations_performed': operations_count,
             'unit_percentage': round(unit_percentage, 1),
-            'observations': report['observations'],
-            'checklist_data': loaded_checklist_data
+            'observations': report['observations']
+        }
+
+    @property
+    def operations_series(self):
+        labels = sorted(self.daily_total_operations.keys())
+        return {'labels': labels, 'data': [self.daily_total_operations[date] for date in labels]}
+
+    @property
+    def unit_completion_series(self):
+        labels = sorted(self.daily_unit_completion.keys())
+        data = []
+        for date in labels:
+            day = self.daily_unit_completion[date]
+            data.append(round(day['total_percentage'] / day['count'], 1) if day['count'] > 0 else 0)
+        return {'labels': labels, 'data': data}
+
+    @property
+    def chart_data_operations(self):
+        return json.dumps(downsample_series(self.operations_series, self.resolution, aggregate='sum'))
+
+    @property
+    def chart_data_unit_completion(self):
+        return json.dumps(downsample_series(self.unit_completion_series, self.resolution))
+
+    @property
+    def chart_data_historical_goals(self):
+        hospital_ids = sorted(self.hospital_met_goal_counts.keys())
+        return json.dumps({
+            'labels': [HOSPITAL_NAMES.get(h_id, h_id) for h_id in hospital_ids],
+            'datasets': [{
+                'label': 'Veces Meta Cumplida',
+                'data': [self.hospital_met_goal_counts[h_id] for h_id in hospital_ids]
+            }]
         })
 
-        if report_date not in daily_total_operations:
-            daily_total_operations[report_date] = 0
-        if operations_count is not None:
-            daily_total_operations[report_date] += operations_count
-
-        if report_date not in daily_unit_completion:
-            daily_unit_completion[report_date] = {'total_percentage': 0, 'count': 0}
-        daily_unit_completion[report_date]['total_percentage'] += unit_percentage
-        daily_unit_completion[report_date]['count'] += 1
-
-        # For historical goals: store 1 for met goal, 0 for not met. We'll count these on the frontend.
-        # This structure is maintained for flexibility, even if the current chart just counts '1's.
-        if report_date not in historical_goals_data[hospital_id]['labels']:
-            historical_goals_data[hospital_id]['labels'].append(report_date)
-            historical_goals_data[hospital_id]['data'].append(1 if report['met_goal'] == 1 else 0)
-        else:
-            # If a hospital has multiple reports on the same day (shouldn't happen with current logic, but for robustness)
-            # we'll just keep the last one.
-            idx = historical_goals_data[hospital_id]['labels'].index(report_date)
-            historical_goals_data[hospital_id]['data'][idx] = 1 if report['met_goal'] == 1 else 0
-
-        for category, items in CHECKLIST_ITEMS.items():
-            for item in items:
-                checklist_item_analysis[item]['total'] += 1
-                if loaded_checklist_data.get(item) == True:
-                    checklist_item_analysis[item]['checked'] += 1
-            
-            otro_checkbox_name = f"{category}_otro_checkbox"
-            otro_text_name = f"{category}_otro_text"
-            
-            if loaded_checklist_data.get(otro_text_name) and loaded_checklist_data[otro_text_name].strip() != '':
-                checklist_item_analysis[otro_checkbox_name]['total'] += 1
-                if loaded_checklist_data.get(otro_checkbox_name) == True:
-                    checklist_item_analysis[otro_checkbox_name]['checked'] += 1
-    
-    for date, data in daily_unit_completion.items():
-        if data['count'] > 0:
-            daily_unit_completion[date] = round(data['total_percentage'] / data['count'], 1)
+    @property
+    def detailed_checklist_percentages(self):
+        detailed_checklist_percentages = []
+        for item_name, counts in self.checklist_item_analysis.items():
+            if counts['total'] > 0:
+                percentage = (counts['checked'] / counts['total']) * 100
+                display_name = item_name.replace('_otro_checkbox', ' (Otro)').replace('_', ' ').capitalize()
+                detailed_checklist_percentages.append({
+                    'item': display_name,
+                    'percentage': round(percentage, 1),
+                    'checked_count': counts['checked'],
+                    'total_count': counts['total']
+                })
+        detailed_checklist_percentages.sort(key=lambda x: x['percentage'], reverse=True)
+        return detailed_checklist_percentages
+
+# NEW: Chart series downsampling for long date ranges
+CHART_MAX_POINTS = 120
+CHART_RESOLUTIONS = {
+    'auto': 'Automática',
+    'raw': 'Diaria (datos completos)',
+    'week': 'Semanal',
+    'month': 'Mensual',
+    'lttb': 'Forma de la serie (LTTB)'
+}
+
+def _bucket_key(date_str, resolution):
+    if resolution == 'month':
+        return date_str[:7] + '-01'
+    date = datetime.strptime(date_str, '%Y-%m-%d')
+    return format_date(date - timedelta(days=date.weekday())) # Monday of the week
+
+def bucket_series(labels, data, resolution, aggregate):
+    """Groups a daily series into weeks or months, summing or averaging each bucket."""
+    bucket_labels, bucket_data = [], []
+    current_key, values = None, []
+    for label, value in zip(labels, data):
+        key = _bucket_key(label, resolution)
+        if key != current_key and values:
+            bucket_labels.append(current_key)
+            bucket_data.append(values)
+            values = []
+        current_key = key
+        values.append(value)
+    if values:
+        bucket_labels.append(current_key)
+        bucket_data.append(values)
+
+    if aggregate == 'sum':
+        return bucket_labels, [sum(values) for values in bucket_data]
+    return bucket_labels, [round(sum(values) / len(values), 2) for values in bucket_data]
+
+def lttb(labels, data, threshold):
+    """Largest-Triangle-Three-Buckets: keeps the points that best preserve the visual shape."""
+    length = len(data)
+    if threshold >= length or threshold < 3:
+        return labels, data
+
+    x = [datetime.strptime(label, '%Y-%m-%d').toordinal() for label in labels]
+    selected = [0]
+    bucket_size = (length - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket is the third vertex of the triangle
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, length)
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(data[next_start:next_end]) / (next_end - next_start)
+
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        max_area, max_index = -1, start
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (data[j] - data[a]) - (x[a] - x[j]) * (avg_y - data[a]))
+            if area > max_area:
+                max_area, max_index = area, j
+        selected.append(max_index)
+        a = max_index
+    selected.append(length - 1)
+    return [labels[i] for i in selected], [data[i] for i in selected]
+
+def downsample_series(series, resolution='auto', aggregate='mean'):
+    """Reduces a daily {'labels', 'data'} series for charting.
+
+    'auto' keeps short ranges as they are and buckets longer ones by week or month
+    so at most CHART_MAX_POINTS points are sent to the browser.
+    """
+    labels, data = series['labels'], series['data']
+    if resolution == 'auto':
+        if len(labels) <= CHART_MAX_POINTS:
+            resolution = 'raw'
+        elif len(labels) <= CHART_MAX_POINTS * 7:
+            resolution = 'week'
         else:
-            daily_unit_completion[date] = 0
+            resolution = 'month'
 
-    chart_data_operations = {
-        'labels': sorted(daily_total_operations.keys()),
-        'data': [daily_total_operations[date] for date in sorted(daily_total_operations.keys())]
-    }
+    if resolution == 'lttb':
+        labels, data = lttb(labels, data, CHART_MAX_POINTS)
+    elif resolution in ('week', 'month'):
+        labels, data = bucket_series(labels, data, resolution, aggregate)
+    else:
+        resolution = 'raw'
+    return {'labels': labels, 'data': data, 'resolution': resolution}
 
-    chart_data_unit_completion = {
-        'labels': sorted(daily_unit_completion.keys()),
-        'data': [daily_unit_completion[date] for date in sorted(daily_unit_completion.keys())]
-    }
+def get_chart_resolution():
+    resolution = request.form.get('resolution') or request.args.get('resolution') or 'auto'
+    return resolution if resolution in CHART_RESOLUTIONS else 'auto'
 
-    # Prepare data for the new bar chart. We need to iterate through all hospitals
-    # and for each, count how many times 'met_goal' was true (1)
-    chart_data_historical_goals = {
-        'labels': [], # This will be filled with hospital names
-        'datasets': [] # This will contain one dataset for the bar chart
-    }
+def resolve_date_range(start_date_str, end_date_str, default_days):
+    """Validates a YYYY-MM-DD range, falling back to the last default_days days.
 
-    hospital_met_goal_counts = {}
-    for hospital_id in HOSPITAL_NAMES.keys():
-        hospital_met_goal_counts[hospital_id] = 0
-    
-    # Iterate through all raw reports in the date range to count met goals per hospital
-    for report in raw_reports:
-        if report['met_goal'] == 1:
-            hospital_met_goal_counts[report['hospital_id']] = hospital_met_goal_counts.get(report['hospital_id'], 0) + 1
+    Returns (start_date_str, end_date_str, error message or None).
+    """
+    error = None
+    if start_date_str and end_date_str:
+        try:
+            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
+            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
+            if start_date > end_date:
+                error = 'La fecha de inicio no puede ser posterior a la fecha de fin.'
+            elif len(get_archived_years_in_range(format_date(start_date), format_date(end_date))) > ARCHIVE_MAX_ATTACHED_YEARS:
+                # Each archived year is attached to the connection that reads it
+                error = f'El rango no puede abarcar más de {ARCHIVE_MAX_ATTACHED_YEARS} años archivados.'
+            else:
+                return format_date(start_date), format_date(end_date), None
+        except ValueError:
+            error = 'Formato de fecha inválido. Use AAAA-MM-DD.'
+
+    end_date = datetime.now()
+    start_date = end_date - timedelta(days=default_days - 1)
+    return format_date(start_date), format_date(end_date), error
+
+@app.route('/statistics', methods=['GET', 'POST'])
+def statistics():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('login'))
+
+    # Optional: Log access to statistics page
+    log_action(session['user_id'], 'accessed statistics page', request.remote_addr)
+
+    db = get_analytics_db()
     
-    # Populate the chart_data_historical_goals for the bar chart
-    chart_data_historical_goals['labels'] = [HOSPITAL_NAMES.get(h_id, h_id) for h_id in sorted(hospital_met_goal_counts.keys())]
-    chart_data_historical_goals['datasets'].append({
-        'label': 'Veces Meta Cumplida',
-        'data': [hospital_met_goal_counts[h_id] for h_id in sorted(hospital_met_goal_counts.keys())],
-        # Colors can be handled on the frontend or fixed here if desired
-    })
-
-
-    detailed_checklist_percentages = []
-    for item_name, counts in checklist_item_analysis.items():
-        if counts['total'] > 0:
-            percentage = (counts['checked'] / counts['total']) * 100 if counts['total'] > 0 else 0
-            display_name = item_name.replace('_otro_checkbox', ' (Otro)').replace('_', ' ').capitalize()
-            detailed_checklist_percentages.append({
-                'item': display_name,
-                'percentage': round(percentage, 1),
-                'checked_count': counts['checked'],
-                'total_count': counts['total']
-            })
-    detailed_checklist_percentages.sort(key=lambda x: x['percentage'], reverse=True)
+    start_date_str, end_date_str, error = resolve_date_range(
+        request.form.get('start_date'), request.form.get('end_date'), default_days=7
+    )
+    if error:
+        flash(error, 'error')
+    resolution = get_chart_resolution()
 
+    query = f"""
+        SELECT hospital_id, date, checklist_data, observations, met_goal, operations_performed, schema_version
+        FROM {reports_source(db, start_date_str, end_date_str)}
+        WHERE date BETWEEN ? AND ?
+        ORDER BY date ASC, hospital_id ASC
+    """
+    # The cursor is consumed while the page streams, so rows are never all held in memory
+    stats = StatisticsAggregator(resolution)
+    reports = stats.process(db.execute(query, (start_date_str, end_date_str)))
 
-    return render_template(
+    return stream_template(
         'statistics.html',
+        flashed_messages=get_flashed_messages(with_categories=True),
         hospital_names=HOSPITAL_NAMES,
-        reports=processed_reports,
+        reports=reports,
+        stats=stats,
         start_date=start_date_str,
         end_date=end_date_str,
-        chart_data_operations=json.dumps(chart_data_operations),
-        chart_data_unit_completion=json.dumps(chart_data_unit_completion),
-        chart_data_historical_goals=json.dumps(chart_data_historical_goals),
-        detailed_checklist_percentages=detailed_checklist_percentages,
-        checklist_items_structure=CHECKLIST_ITEMS
+        resolution=resolution,
+        chart_resolutions=CHART_RESOLUTIONS,
+        export_formats={fmt: label for fmt, (label, mimetype) in EXPORT_FORMATS.items() if export_format_available(fmt)},
+        checklist_items_structure=get_current_checklist_schema().items
     )
 
+OBSERVATION_KEYWORDS = ['falla de red', 'falta de personal', 'maquina dañada', 'agua', 'aire acondicionado', 'limpieza', 'vacaciones', 'ausentismo', 'pagos', 'facturas', 'kits', 'medicamentos', 'sistema', 'impresora', 'equipo dañado']
+
+def count_report_problems(recurring_problems, unchecked_items, observations):
+    """Adds a report's unchecked items and observation keywords to the recurring problem counts."""
+    for item in unchecked_items:
+        recurring_problems[item] = recurring_problems.get(item, 0) + 1
+
+    observations_text = (observations or '').lower()
+    for keyword in OBSERVATION_KEYWORDS:
+        if keyword in observations_text:
+            recurring_problems[f"Observación: {keyword}"] = recurring_problems.get(f"Observación: {keyword}", 0) + 1
+
+def compute_hospital_trends(db, hospital_id, start_date_str, end_date_str):
+    """Report rows, daily chart series and recurring problems of one hospital for a range."""
+    query = f"""
+        SELECT date, checklist_data, observations, met_goal, operations_performed, schema_version
+        FROM {reports_source(db, start_date_str, end_date_str)}
+        WHERE hospital_id = ? AND date BETWEEN ? AND ?
+        ORDER BY date ASC
+    """
+    hospital_reports_data = []
+    unit_percentage_chart_data = {'labels': [], 'data': []}
+    met_goal_chart_data = {'labels': [], 'data': []}
+    recurring_problems = {}
+
+    for report in db.execute(query, (hospital_id, start_date_str, end_date_str)):
+        report_date = report['date']
+        loaded_checklist_data = json.loads(report['checklist_data'])
+        schema = get_checklist_schema(report['schema_version'])
+
+        unit_percentage = schema.unit_percentage(loaded_checklist_data)
+        unchecked_items_today = schema.unchecked_items(loaded_checklist_data)
+
+        hospital_reports_data.append({
+            'date': report_date,
+            'met_goal': report['met_goal'],
+            'operations_performed': report['operations_performed'],
+            'unit_percentage': round(unit_percentage, 1),
+            'observations': report['observations'] or ''
+        })
+
+        unit_percentage_chart_data['labels'].append(report_date)
+        unit_percentage_chart_data['data'].append(round(unit_percentage, 1))
+
+        met_goal_chart_data['labels'].append(report_date)
+        met_goal_chart_data['data'].append(1 if report['met_goal'] == 1 else 0)
+
+        count_report_problems(recurring_problems, unchecked_items_today, report['observations'])
+
+    return {
+        'reports': hospital_reports_data,
+        'unit_percentage_series': unit_percentage_chart_data,
+        'met_goal_series': met_goal_chart_data,
+        'recurring_problems': sorted(recurring_problems.items(), key=lambda item: item[1], reverse=True)
+    }
+
+# NEW: All-hospitals comparison
+ALL_HOSPITALS = '__all__'
+COMPARISON_TOP_PROBLEMS = 5
+# A single scan costs roughly 15-20 µs per report, so below COMPARISON_PARALLEL_MIN_REPORTS (about
+# 0.1 s of work, under three years of data) starting the pool costs more than splitting saves
+COMPARISON_POOL_TIMEOUT = 60 # Seconds; past this the comparison falls back to a single scan
+
+_comparison_pool = None
+
+class HospitalSummary:
+    """Comparison figures for one hospital, accumulated report by report."""
+
+    def __init__(self, hospital_id):
+        self.hospital_id = hospital_id
+        self.report_count = 0
+        self.unit_percentage_total = 0
+        self.met_goal_count = 0
+        self.operations_total = 0
+        self.recurring_problems = {}
+        self.unit_percentage_series = {'labels': [], 'data': []}
+
+    def add(self, report):
+        loaded_checklist_data = json.loads(report['checklist_data'])
+        schema = get_checklist_schema(report['schema_version'])
+        unit_percentage = schema.unit_percentage(loaded_checklist_data)
+
+        self.report_count += 1
+        self.unit_percentage_total += unit_percentage
+        if report['met_goal'] == 1:
+            self.met_goal_count += 1
+            self.operations_total += OPERATIONS_PER_DAY
+        elif report['operations_performed'] is not None:
+            self.operations_total += report['operations_performed']
+
+        self.unit_percentage_series['labels'].append(report['date'])
+        self.unit_percentage_series['data'].append(round(unit_percentage, 1))
+        count_report_problems(self.recurring_problems, schema.unchecked_items(loaded_checklist_data), report['observations'])
+
+    def result(self, resolution='auto'):
+        count = self.report_count
+        top_problems = sorted(self.recurring_problems.items(), key=lambda item: item[1], reverse=True)
+        return {
+            'hospital_id': self.hospital_id,
+            'name': HOSPITAL_NAMES.get(self.hospital_id, self.hospital_id),
+            'report_count': count,
+            'unit_percentage': round(self.unit_percentage_total / count, 1) if count else 0,
+            'met_goal_rate': round(self.met_goal_count / count * 100, 1) if count else 0,
+            'operations': self.operations_total,
+            'top_problems': top_problems[:COMPARISON_TOP_PROBLEMS],
+            'unit_percentage_series': downsample_series(self.unit_percentage_series, resolution)
+        }
+
+COMPARISON_QUERY = """
+    SELECT hospital_id, date, checklist_data, observations, met_goal, operations_performed, schema_version
+    FROM {source}
+    WHERE date BETWEEN ? AND ?{hospital_filter}
+    ORDER BY hospital_id ASC, date ASC
+"""
+
+def _summarize_hospital_worker(database, archive_folder, hospital_id, start_date_str, end_date_str, resolution):
+    """Process pool entry point: summarizes one hospital with its own connection."""
+    with app.app_context():
+        app.config['DATABASE'] = database
+        app.config['ARCHIVE_FOLDER'] = archive_folder
+        db = get_db()
+        summary = HospitalSummary(hospital_id)
+        query = COMPARISON_QUERY.format(
+            source=reports_source(db, start_date_str, end_date_str), hospital_filter=' AND hospital_id = ?'
+        )
+        for report in db.execute(query, (start_date_str, end_date_str, hospital_id)):
+            summary.add(report)
+        return summary.result(resolution)
+
+def get_comparison_pool():
+    global _comparison_pool
+    if _comparison_pool is None:
+        # 'spawn' avoids forking a multi-threaded server process
+        _comparison_pool = ProcessPoolExecutor(
+            max_workers=min(len(HOSPITAL_NAMES), os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _comparison_pool
+
+def _compare_hospitals_in_pool(db, start_date_str, end_date_str, resolution):
+    """One hospital per pool process. Returns None if the pool fails or times out."""
+    global _comparison_pool
+    database = db.execute('PRAGMA database_list').fetchone()['file'] # Workers read the same file as db
+    futures = []
+    try:
+        futures = [
+            get_comparison_pool().submit(
+                _summarize_hospital_worker, database, os.path.abspath(app.config['ARCHIVE_FOLDER']),
+                hospital_id, start_date_str, end_date_str, resolution
+            )
+            for hospital_id in HOSPITAL_NAMES
+        ]
+        deadline = time.monotonic() + COMPARISON_POOL_TIMEOUT
+        return [future.result(timeout=max(0, deadline - time.monotonic())) for future in futures]
+    except BrokenProcessPool:
+        app.logger.warning('Comparison pool broke; comparing in a single scan')
+        _comparison_pool = None
+    except FutureTimeoutError:
+        app.logger.warning('Comparison pool timed out; comparing in a single scan')
+        for future in futures:
+            future.cancel()
+    return None
+
+def compare_hospitals(db, start_date_str, end_date_str, resolution='auto'):
+    """Summarizes every hospital for a range, ranked by average unit percentage.
+
+    Normal ranges are computed in a single scan; very large ones are spread over a process pool.
+    """
+    days = (datetime.strptime(end_date_str, '%Y-%m-%d') - datetime.strptime(start_date_str, '%Y-%m-%d')).days + 1
+    results = None
+    if days * len(HOSPITAL_NAMES) >= app.config['COMPARISON_PARALLEL_MIN_REPORTS'] and (os.cpu_count() or 1) > 1:
+        results = _compare_hospitals_in_pool(db, start_date_str, end_date_str, resolution)
+    if results is None:
+        summaries = {hospital_id: HospitalSummary(hospital_id) for hospital_id in HOSPITAL_NAMES}
+        query = COMPARISON_QUERY.format(source=reports_source(db, start_date_str, end_date_str), hospital_filter='')
+        for report in db.execute(query, (start_date_str, end_date_str)):
+            summary = summaries.get(report['hospital_id'])
+            if summary is None:
+                summary = summaries[report['hospital_id']] = HospitalSummary(report['hospital_id'])
+            summary.add(report)
+        results = [summary.result(resolution) for summary in summaries.values()]
+
+    results.sort(key=lambda result: (result['unit_percentage'], result['met_goal_rate']), reverse=True)
+    for rank, result in enumerate(results, start=1):
+        result['rank'] = rank
+    return results
+
 @app.route('/hospital_trends', methods=['GET', 'POST'])
 def hospital_trends():
     if 'user_id' not in session or session['role'] != 'admin':
@@ -864,113 +2194,180 @@ def hospital_trends():
     # Optional: Log access to hospital trends page
     log_action(session['user_id'], 'accessed hospital trends page', request.remote_addr)
 
-    db = get_db()
+    db = get_analytics_db()
     
     selected_hospital_id = request.form.get('hospital_id') or request.args.get('hospital_id')
-    start_date_str = request.form.get('start_date') or request.args.get('start_date')
-    end_date_str = request.form.get('end_date') or request.args.get('end_date')
-
-    if not start_date_str or not end_date_str:
-        end_date = datetime.now()
-        start_date = end_date - timedelta(days=29)
-        start_date_str = start_date.strftime('%Y-%m-%d')
-        end_date_str = end_date.strftime('%Y-%m-%d')
-    else:
-        try:
-            start_date = datetime.strptime(start_date_str, '%Y-%m-%d')
-            end_date = datetime.strptime(end_date_str, '%Y-%m-%d')
-            if start_date > end_date:
-                flash('La fecha de inicio no puede ser posterior a la fecha de fin.', 'error')
-                end_date = datetime.now()
-                start_date = end_date - timedelta(days=29)
-                start_date_str = start_date.strftime('%Y-%m-%d')
-                end_date_str = end_date.strftime('%Y-%m-%d')
-        except ValueError:
-            flash('Formato de fecha inválido. Use AAAA-MM-DD.', 'error')
-            end_date = datetime.now()
-            start_date = end_date - timedelta(days=29)
-            start_date_str = start_date.strftime('%Y-%m-%d')
-            end_date_str = end_date.strftime('%Y-%m-%d')
+    start_date_str, end_date_str, error = resolve_date_range(
+        request.form.get('start_date') or request.args.get('start_date'),
+        request.form.get('end_date') or request.args.get('end_date'),
+        default_days=30
+    )
+    if error:
+        flash(error, 'error')
+    resolution = get_chart_resolution()
 
     hospital_reports_data = []
     unit_percentage_chart_data = {'labels': [], 'data': []}
     met_goal_chart_data = {'labels': [], 'data': []}
-    recurring_problems = {}
-
-    if selected_hospital_id:
-        query = """
-            SELECT date, checklist_data, observations, met_goal, operations_performed
-            FROM reports
-            WHERE hospital_id = ? AND date BETWEEN ? AND ?
-            ORDER BY date ASC
-        """
-        raw_reports = db.execute(query, (selected_hospital_id, start_date_str, end_date_str)).fetchall()
-
-        for report in raw_reports:
-            report_date = report['date']
-            loaded_checklist_data = json.loads(report['checklist_data'])
-
-            total_items_report = 0
-            checked_items_count_report = 0
-            
-            unchecked_items_today = []
-
-            for category, items in CHECKLIST_ITEMS.items():
-                for item in items:
-                    total_items_report += 1
-                    if loaded_checklist_data.get(item):
-                        checked_items_count_report += 1
-                    else:
-                        unchecked_items_today.append(f"{category}: {item}")
-                
-                otro_checkbox_name = f"{category}_otro_checkbox"
-                otro_text_name = f"{category}_otro_text"
-                
-                if loaded_checklist_data.get(otro_text_name) and loaded_checklist_data[otro_text_name].strip() != '':
-                    total_items_report += 1
-                    if loaded_checklist_data.get(otro_checkbox_name):
-                        checked_items_count_report += 1
-                    else:
-                        unchecked_items_today.append(f"{category}: Otro ({loaded_checklist_data[otro_text_name]})")
-
-            unit_percentage = (checked_items_count_report / total_items_report) * 100 if total_items_report > 0 else 0
-
-            hospital_reports_data.append({
-                'date': report_date,
-                'met_goal': report['met_goal'],
-                'operations_performed': report['operations_performed'],
-                'unit_percentage': round(unit_percentage, 1),
-                'observations': report['observations'] or ''
-            })
-
-            unit_percentage_chart_data['labels'].append(report_date)
-            unit_percentage_chart_data['data'].append(round(unit_percentage, 1))
-
-            met_goal_chart_data['labels'].append(report_date)
-            met_goal_chart_data['data'].append(1 if report['met_goal'] == 1 else 0)
-
-            for item in unchecked_items_today:
-                recurring_problems[item] = recurring_problems.get(item, 0) + 1
-            
-            observations_text = report['observations'].lower()
-            keywords = ['falla de red', 'falta de personal', 'maquina dañada', 'agua', 'aire acondicionado', 'limpieza', 'vacaciones', 'ausentismo', 'pagos', 'facturas', 'kits', 'medicamentos', 'sistema', 'impresora', 'equipo dañado']
-            for keyword in keywords:
-                if keyword in observations_text:
-                    recurring_problems[f"Observación: {keyword}"] = recurring_problems.get(f"Observación: {keyword}", 0) + 1
-
-    sorted_recurring_problems = sorted(recurring_problems.items(), key=lambda item: item[1], reverse=True)
+    recurring_problems = []
+    comparison = None
+
+    if selected_hospital_id == ALL_HOSPITALS:
+        comparison = compare_hospitals(db, start_date_str, end_date_str, resolution)
+    elif selected_hospital_id:
+        trends = compute_hospital_trends(db, selected_hospital_id, start_date_str, end_date_str)
+        hospital_reports_data = trends['reports']
+        unit_percentage_chart_data = downsample_series(trends['unit_percentage_series'], resolution)
+        met_goal_chart_data = downsample_series(trends['met_goal_series'], resolution)
+        recurring_problems = trends['recurring_problems']
 
     return render_template(
         'hospital_trends.html',
         hospital_names=HOSPITAL_NAMES,
         selected_hospital_id=selected_hospital_id,
         selected_hospital_name=HOSPITAL_NAMES.get(selected_hospital_id, 'Seleccione un Hospital'),
+        all_hospitals=ALL_HOSPITALS,
+        comparison=comparison,
         start_date=start_date_str,
         end_date=end_date_str,
+        resolution=resolution,
+        chart_resolutions=CHART_RESOLUTIONS,
         hospital_reports_data=hospital_reports_data,
         unit_percentage_chart_data=json.dumps(unit_percentage_chart_data),
         met_goal_chart_data=json.dumps(met_goal_chart_data),
-        recurring_problems=sorted_recurring_problems
+        recurring_problems=recurring_problems
+    )
+
+@app.route('/api/chart_series')
+def chart_series():
+    """Returns the full-resolution (or requested resolution) chart series for a range."""
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'No autorizado.'}), 401
+
+    start_date_str, end_date_str, error = resolve_date_range(
+        request.args.get('start_date'), request.args.get('end_date'), default_days=30
+    )
+    if error:
+        return jsonify({'error': error}), 400
+    resolution = request.args.get('resolution', 'raw')
+    if resolution not in CHART_RESOLUTIONS:
+        return jsonify({'error': 'Resolución no válida.'}), 400
+
+    db = get_analytics_db()
+    hospital_id = request.args.get('hospital_id')
+    if hospital_id:
+        if hospital_id not in HOSPITAL_NAMES:
+            return jsonify({'error': 'Hospital desconocido.'}), 404
+        trends = compute_hospital_trends(db, hospital_id, start_date_str, end_date_str)
+        series = {
+            'unit_percentage': downsample_series(trends['unit_percentage_series'], resolution),
+            'met_goal': downsample_series(trends['met_goal_series'], resolution)
+        }
+    else:
+        stats = StatisticsAggregator(resolution)
+        for _ in stats.process(db.execute(
+            'SELECT hospital_id, date, checklist_data, observations, met_goal, operations_performed, schema_version '
+            f'FROM {reports_source(db, start_date_str, end_date_str)} WHERE date BETWEEN ? AND ?',
+            (start_date_str, end_date_str)
+        )):
+            pass
+        series = {
+            'operations': downsample_series(stats.operations_series, resolution, aggregate='sum'),
+            'unit_completion': downsample_series(stats.unit_completion_series, resolution)
+        }
+    return jsonify({'start_date': start_date_str, 'end_date': end_date_str, 'data_as_of': analytics_as_of(), 'series': series})
+
+# NEW: Active recurring-problem streaks (admin only)
+@app.route('/problem_streaks')
+def problem_streaks():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('login'))
+
+    min_days = max(request.args.get('min_days', PROBLEM_STREAK_MIN_DAYS, type=int), 1)
+    selected_item = request.args.get('item') or None
+
+    # "last_seen = updated_through" matches the partial index: the item is unchecked in the latest report
+    query = '''
+        SELECT hospital_id, item, current_streak, streak_start, last_seen, longest_streak
+        FROM problem_streaks
+        WHERE last_seen = updated_through AND current_streak >= ?
+    '''
+    params = [min_days]
+    if selected_item:
+        query += ' AND item = ?'
+        params.append(selected_item)
+    query += ' ORDER BY current_streak DESC, hospital_id ASC'
+
+    item_labels = dict(get_current_checklist_schema().problem_labels)
+    streaks = [
+        {
+            'hospital_name': HOSPITAL_NAMES.get(row['hospital_id'], row['hospital_id']),
+            'item': item_labels.get(row['item'], row['item']),
+            'current_streak': row['current_streak'],
+            'streak_start': row['streak_start'],
+            'last_seen': row['last_seen'],
+            'longest_streak': row['longest_streak']
+        }
+        for row in get_db().execute(query, params)
+    ]
+
+    return render_template(
+        'problem_streaks.html',
+        streaks=streaks,
+        min_days=min_days,
+        selected_item=selected_item,
+        item_labels=item_labels
+    )
+
+# NEW: Alert history (admin only)
+@app.route('/alerts')
+def alert_history():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('login'))
+
+    start_date_str, end_date_str, error = resolve_date_range(
+        request.args.get('start_date'), request.args.get('end_date'), default_days=30
+    )
+    if error:
+        flash(error, 'error')
+    selected_hospital_id = request.args.get('hospital_id') or None
+    selected_kind = request.args.get('kind') or None
+
+    query = '''
+        SELECT hospital_id, date, kind, detail, created_at, resolved_at FROM alerts
+        WHERE date BETWEEN ? AND ?
+    '''
+    params = [start_date_str, end_date_str]
+    if selected_hospital_id:
+        query += ' AND hospital_id = ?'
+        params.append(selected_hospital_id)
+    if selected_kind:
+        query += ' AND kind = ?'
+        params.append(selected_kind)
+    query += ' ORDER BY date DESC, hospital_id ASC LIMIT ?'
+    params.append(ALERT_HISTORY_LIMIT)
+
+    alerts = [
+        {
+            'hospital_name': HOSPITAL_NAMES.get(row['hospital_id'], row['hospital_id']),
+            'date': row['date'],
+            'kind': ALERT_KINDS.get(row['kind'], row['kind']),
+            'detail': row['detail'],
+            'resolved_at': row['resolved_at'][:16].replace('T', ' ') if row['resolved_at'] else None
+        }
+        for row in get_db().execute(query, params)
+    ]
+
+    return render_template(
+        'alerts.html',
+        alerts=alerts,
+        alert_limit=ALERT_HISTORY_LIMIT,
+        hospital_names=HOSPITAL_NAMES,
+        alert_kinds=ALERT_KINDS,
+        selected_hospital_id=selected_hospital_id,
+        selected_kind=selected_kind,
+        start_date=start_date_str,
+        end_date=end_date_str
     )
 
 # NEW: Add a route for viewing logs (admin only)
@@ -995,9 +2392,518 @@ def view_logs():
 
     return render_template('logs.html', logs=logs)
 
+# NEW: Bulk report import for offline hospital sync and data migration
+BULK_IMPORT_CHUNK_SIZE = 500
+
+def read_import_records(stream, fmt):
+    """Yields (line number, record, error) from a JSON Lines or CSV text stream."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record, None
+        return
+
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f'JSON inválido: {e}'
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, 'Cada línea debe ser un objeto JSON.'
+            continue
+        yield line_number, record, None
+
+def prepare_import_record(record, schema, today, allowed_hospital_id=None):
+    """Validates an imported record with the checklist form rules.
+
+    Returns (hospital_id, date, checklist_data, observations, met_goal, operations_performed)
+    and an error message, one of which is None.
+    """
+    hospital_id = str(record.get('hospital_id') or '').strip()
+    if hospital_id not in HOSPITAL_NAMES:
+        return None, f'Hospital desconocido: {hospital_id}'
+    if allowed_hospital_id is not None and hospital_id != allowed_hospital_id:
+        return None, 'No tiene permiso para cargar reportes de este hospital.'
+
+    try:
+        report_date = format_date(datetime.strptime(str(record.get('date') or '').strip(), '%Y-%m-%d'))
+    except ValueError:
+        return None, 'Formato de fecha inválido. Use AAAA-MM-DD.'
+    if report_date > today:
+        return None, 'La fecha del reporte no puede ser posterior a hoy.'
+
+    met_goal_value = record.get('met_goal')
+    if met_goal_value is not None and str(met_goal_value).strip() != '':
+        met_goal_value = 'true' if is_truthy(met_goal_value) else 'false'
+    else:
+        met_goal_value = None
+    met_goal, operations_performed, error = validate_report_fields(met_goal_value, record.get('operations_performed'))
+    if error:
+        return None, error
+
+    # Checklist items may come nested (JSON Lines) or as flat columns (CSV)
+    checklist_record = record.get('checklist_data')
+    if not isinstance(checklist_record, dict):
+        checklist_record = record
+    checklist_data = schema.parse_record(checklist_record)
+
+    observations = str(record.get('observations') or '')
+    return (hospital_id, report_date, checklist_data, observations, met_goal, operations_performed), None
+
+def import_reports(db, records, submitted_by, allowed_hospital_id=None):
+    """Validates and upserts dated reports in chunked executemany transactions.
+
+    records are (line number, record, error) tuples as yielded by read_import_records.
+    Returns one result per row with its status: 'inserted', 'updated' or 'error'.
+    """
+    schema = get_current_checklist_schema()
+    today = format_date()
+    results = []
+    chunk = []
+
+    def flush():
+        dates = sorted({values[1] for _, values in chunk})
+        existing = {
+            (row['hospital_id'], row['date'])
+            for row in db.execute(
+                f"SELECT hospital_id, date FROM reports WHERE date IN ({', '.join('?' * len(dates))})", dates
+            )
+        }
+        submitted_at = datetime.now().isoformat()
+        rows = []
+        for result, values in chunk:
+            key = values[:2]
+            result['status'] = 'updated' if key in existing else 'inserted'
+            existing.add(key)
+            hospital_id, report_date, checklist_data, observations, met_goal, operations_performed = values
+            rows.append((
+                hospital_id, report_date, json.dumps(checklist_data), observations, met_goal,
+                operations_performed, submitted_by, submitted_at, schema.version
+            ))
+        try:
+            db.executemany(UPSERT_REPORT_SQL, rows)
+            db.commit()
+        except sqlite3.Error as e:
+            db.rollback()
+            for result, _ in chunk:
+                result['status'] = 'error'
+                result['error'] = f'Error al guardar el reporte: {e}'
+        chunk.clear()
+
+    for line_number, record, error in records:
+        result = {'line': line_number}
+        results.append(result)
+        if error is None:
+            values, error = prepare_import_record(record, schema, today, allowed_hospital_id)
+        if error is not None:
+            result['status'] = 'error'
+            result['error'] = error
+            continue
+        result['hospital_id'], result['date'] = values[0], values[1]
+        chunk.append((result, values))
+        if len(chunk) >= BULK_IMPORT_CHUNK_SIZE:
+            flush()
+    if chunk:
+        flush()
+
+    # Imported reports can land anywhere in the history, so the streaks are replayed once per hospital
+    saved = [(result['hospital_id'], result['date']) for result in results if result['status'] != 'error']
+    for hospital_id in sorted({hospital_id for hospital_id, _ in saved}):
+        rebuild_problem_streaks(db, hospital_id)
+    reconcile_alerts(db, saved)
+    db.commit()
+    return results
+
+def summarize_import(results):
+    summary = {'inserted': 0, 'updated': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+    return summary
+
+@app.route('/api/reports/bulk', methods=['POST'])
+def bulk_import_reports():
+    """Imports many dated reports at once (JSON Lines or CSV body, or a 'file' upload).
+
+    Admins can load any hospital; hospital users only their own.
+    """
+    if 'user_id' not in session or session['role'] not in ('admin', 'hospital'):
+        return jsonify({'error': 'No autorizado.'}), 401
+
+    upload = request.files.get('file')
+    fmt = request.args.get('format')
+    if upload:
+        fmt = fmt or ('csv' if upload.filename.lower().endswith('.csv') else 'jsonl')
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+    else:
+        fmt = fmt or ('csv' if request.mimetype == 'text/csv' else 'jsonl')
+        stream = io.StringIO(request.get_data(as_text=True), newline='')
+    if fmt not in ('jsonl', 'csv'):
+        return jsonify({'error': 'Formato no soportado. Use jsonl o csv.'}), 400
+
+    allowed_hospital_id = session['hospital_id'] if session['role'] == 'hospital' else None
+    results = import_reports(get_db(), read_import_records(stream, fmt), session['user_id'], allowed_hospital_id)
+    summary = summarize_import(results)
+    log_action(
+        session['user_id'],
+        f"bulk imported reports: {summary['inserted']} inserted, {summary['updated']} updated, {summary['error']} rejected",
+        request.remote_addr
+    )
+    return jsonify({'summary': summary, 'results': results})
+
+# NEW: Executive summary exports. Requests are queued in export_jobs and rendered by background
+# workers from the analytics snapshot. Files are named by a key over (format, range, hospitals,
+# data version), so a repeated request for unchanged data is answered with the existing file.
+EXPORT_FORMATS = {
+    'xlsx': ('Excel (XLSX)', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'pdf': ('PDF', 'application/pdf')
+}
+EXPORT_RENDER_VERSION = 1 # Bump when the layout of the files changes
+EXPORT_WORKERS = 1
+EXPORT_POLL_INTERVAL = 5 # Seconds
+
+_export_jobs_available = Event() # Set when a job is queued, to wake an idle worker
+
+def export_format_available(fmt):
+    return (fmt == 'xlsx' and openpyxl is not None) or (fmt == 'pdf' and SimpleDocTemplate is not None)
+
+def get_export_path(job):
+    return os.path.join(app.config['EXPORT_FOLDER'], f"{job['cache_key']}.{job['format']}")
+
+def _hospital_filter(hospital_ids):
+    return f"hospital_id IN ({', '.join('?' * len(hospital_ids))})"
+
+def get_export_data_version(db, start_date_str, end_date_str, hospital_ids):
+    """Changes whenever a report of the range is added or re-submitted (or the checklist changes)."""
+    row = db.execute(
+        f"SELECT COUNT(*), MAX(submitted_at) FROM {reports_source(db, start_date_str, end_date_str)} "
+        f"WHERE date BETWEEN ? AND ? AND {_hospital_filter(hospital_ids)}",
+        (start_date_str, end_date_str, *hospital_ids)
+    ).fetchone()
+    return f"{row[0]}:{row[1]}:{get_current_checklist_schema().version}:{EXPORT_RENDER_VERSION}"
+
+def enqueue_export(db, fmt, start_date_str, end_date_str, hospital_ids, user_id):
+    """Returns the job for an export: a finished or pending identical one if any, else a new queued job."""
+    hospital_ids = sorted(hospital_ids)
+    data_version = get_export_data_version(get_analytics_db(), start_date_str, end_date_str, hospital_ids)
+    cache_key = hashlib.sha256(
+        json.dumps([fmt, start_date_str, end_date_str, hospital_ids, data_version]).encode('utf-8')
+    ).hexdigest()
+
+    job = db.execute(
+        "SELECT * FROM export_jobs WHERE cache_key = ? AND status IN ('queued', 'running', 'done') ORDER BY id DESC LIMIT 1",
+        (cache_key,)
+    ).fetchone()
+    if job is not None and (job['status'] != 'done' or os.path.exists(get_export_path(job))):
+        return job
+
+    # A concurrent identical request may have queued it since the check above (idx_export_jobs_pending)
+    db.execute('''
+        INSERT INTO export_jobs (cache_key, format, start_date, end_date, hospital_ids, status, requested_by, created_at)
+        VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)
+        ON CONFLICT DO NOTHING
+    ''', (cache_key, fmt, start_date_str, end_date_str, json.dumps(hospital_ids), user_id, datetime.now().isoformat()))
+    db.commit()
+    _export_jobs_available.set()
+    return db.execute(
+        "SELECT * FROM export_jobs WHERE cache_key = ? AND status IN ('queued', 'running', 'done') ORDER BY id DESC LIMIT 1",
+        (cache_key,)
+    ).fetchone()
+
+def claim_export_job(db):
+    """Marks the oldest queued job as running and returns it (None if the queue is empty).
+
+    The conditional UPDATE makes the claim safe between workers: only one of them changes the row.
+    """
+    while True:
+        job = db.execute("SELECT id FROM export_jobs WHERE status = 'queued' ORDER BY id LIMIT 1").fetchone()
+        if job is None:
+            return None
+        claimed = db.execute(
+            "UPDATE export_jobs SET status = 'running', started_at = ? WHERE id = ? AND status = 'queued'",
+            (datetime.now().isoformat(), job['id'])
+        ).rowcount
+        db.commit()
+        if claimed:
+            return db.execute('SELECT * FROM export_jobs WHERE id = ?', (job['id'],)).fetchone()
+
+def build_export_summary(db, start_date_str, end_date_str, hospital_ids):
+    """The /statistics aggregates and the hospital comparison, restricted to hospital_ids."""
+    stats = StatisticsAggregator('raw')
+    rows = list(stats.process(db.execute(
+        'SELECT hospital_id, date, checklist_data, observations, met_goal, operations_performed, schema_version '
+        f"FROM {reports_source(db, start_date_str, end_date_str)} "
+        f"WHERE date BETWEEN ? AND ? AND {_hospital_filter(hospital_ids)} ORDER BY date ASC, hospital_id ASC",
+        (start_date_str, end_date_str, *hospital_ids)
+    )))
+    comparison = [
+        result for result in compare_hospitals(db, start_date_str, end_date_str)
+        if result['hospital_id'] in hospital_ids
+    ]
+    return rows, stats, comparison
+
+def _export_tables(rows, stats, comparison):
+    """(title, header, rows) of every table in an executive summary."""
+    return [
+        ('Comparativo por Hospital', ['Posición', 'Hospital', 'Reportes', '% Unidad', '% Meta Cumplida', 'Operaciones', 'Problemas Principales'], [
+            [result['rank'], result['name'], result['report_count'], result['unit_percentage'], result['met_goal_rate'],
+             result['operations'], ', '.join(f"{problem} ({count})" for problem, count in result['top_problems'])]
+            for result in comparison
+        ]),
+        ('Análisis del Checklist', ['Item del Checklist', '% Cumplimiento', 'Veces Marcado (Sí)', 'Total de Reportes'], [
+            [item['item'], item['percentage'], item['checked_count'], item['total_count']]
+            for item in stats.detailed_checklist_percentages
+        ]),
+        ('Resumen Ejecutivo de Reportes', ['Fecha', 'Hospital', 'Meta Cumplida', 'Operaciones', '% Unidad', 'Observaciones'], [
+            [row['date'], row['hospital_name'],
+             'Sí' if row['met_goal'] == 1 else 'No' if row['met_goal'] == 0 else 'N/A',
+             row['operations_performed'] if row['operations_performed'] is not None else 'N/A',
+             row['unit_percentage'], row['observations'] or '']
+            for row in rows
+        ])
+    ]
+
+def render_export_xlsx(path, title, tables):
+    workbook = openpyxl.Workbook()
+    workbook.remove(workbook.active)
+    for table_title, header, table_rows in tables:
+        sheet = workbook.create_sheet(table_title[:31]) # Excel limit for sheet names
+        sheet.append([title])
+        sheet.append(header)
+        for row in table_rows:
+            sheet.append(row)
+        sheet.freeze_panes = 'A3'
+    workbook.save(path)
+
+def render_export_pdf(path, title, tables):
+    styles = getSampleStyleSheet()
+    story = [Paragraph(escape(title), styles['Title'])]
+    for table_title, header, table_rows in tables:
+        story += [Spacer(1, 12), Paragraph(table_title, styles['Heading2'])]
+        if not table_rows:
+            story.append(Paragraph('Sin datos para el periodo.', styles['Normal']))
+            continue
+        table = Table(
+            [header] + [[Paragraph(escape(str(value)), styles['BodyText']) for value in row] for row in table_rows],
+            repeatRows=1
+        )
+        table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#235C4F')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('GRID', (0, 0), (-1, -1), 0.25, colors.HexColor('#DEE2E6')),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ]))
+        story.append(table)
+    SimpleDocTemplate(path, pagesize=landscape(A4), title=title).build(story)
+
+EXPORT_RENDERERS = {'xlsx': render_export_xlsx, 'pdf': render_export_pdf}
+
+def process_export_job(db, job):
+    """Renders a claimed job into its content-addressed file (skipped if the file already exists)."""
+    path = get_export_path(job)
+    partial_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        if not os.path.exists(path):
+            if not export_format_available(job['format']):
+                raise RuntimeError(f"El formato {job['format']} no está disponible en el servidor.")
+            hospital_ids = json.loads(job['hospital_ids'])
+            rows, stats, comparison = build_export_summary(get_analytics_db(), job['start_date'], job['end_date'], hospital_ids)
+            title = f"Resumen Ejecutivo de Reportes Hospitalarios ({job['start_date']} a {job['end_date']})"
+            os.makedirs(app.config['EXPORT_FOLDER'], exist_ok=True)
+            EXPORT_RENDERERS[job['format']](partial_path, title, _export_tables(rows, stats, comparison))
+            os.replace(partial_path, path)
+        db.execute(
+            "UPDATE export_jobs SET status = 'done', finished_at = ? WHERE id = ?",
+            (datetime.now().isoformat(), job['id'])
+        )
+        evict_superseded_exports(db, job)
+    except Exception as e:
+        if os.path.exists(partial_path):
+            os.remove(partial_path)
+        db.execute(
+            "UPDATE export_jobs SET status = 'failed', error = ?, finished_at = ? WHERE id = ?",
+            (str(e), datetime.now().isoformat(), job['id'])
+        )
+    db.commit()
+
+def evict_superseded_exports(db, job):
+    """Deletes the files of the same export rendered from older data (without committing).
+
+    Each data version gets its own file, so without this EXPORT_FOLDER would keep one file per
+    report submission followed by an export. Their jobs are marked 'expired'.
+    """
+    superseded = db.execute('''
+        SELECT DISTINCT cache_key, format FROM export_jobs
+        WHERE status = 'done' AND cache_key != ? AND format = ? AND start_date = ? AND end_date = ? AND hospital_ids = ?
+    ''', (job['cache_key'], job['format'], job['start_date'], job['end_date'], job['hospital_ids'])).fetchall()
+    for old_job in superseded:
+        db.execute("UPDATE export_jobs SET status = 'expired' WHERE cache_key = ? AND status = 'done'", (old_job['cache_key'],))
+        path = get_export_path(old_job)
+        if os.path.exists(path):
+            os.remove(path)
+
+def run_export_jobs(until_empty=False):
+    """Worker loop: processes queued exports, waiting for new ones (or returning) when idle."""
+    while True:
+        with app.app_context():
+            job = claim_export_job(get_db())
+            if job is not None:
+                process_export_job(get_db(), job)
+                continue
+        if until_empty:
+            return
+        _export_jobs_available.wait(EXPORT_POLL_INTERVAL)
+        _export_jobs_available.clear()
+
+def requeue_interrupted_exports():
+    """Jobs left 'running' by a stopped worker are queued again."""
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE export_jobs SET status = 'queued', started_at = NULL WHERE status = 'running'")
+        db.commit()
+
+def export_job_status(job):
+    status = {
+        'id': job['id'],
+        'status': job['status'],
+        'format': job['format'],
+        'start_date': job['start_date'],
+        'end_date': job['end_date'],
+        'hospital_ids': json.loads(job['hospital_ids']),
+        'created_at': job['created_at'],
+        'finished_at': job['finished_at']
+    }
+    if job['status'] == 'done':
+        status['download_url'] = url_for('download_export', job_id=job['id'])
+    if job['status'] == 'failed':
+        status['error'] = job['error']
+    return status
+
+@app.route('/api/exports', methods=['POST'])
+def create_export():
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'No autorizado.'}), 401
+
+    payload = request.get_json(silent=True) or request.form
+    fmt = payload.get('format')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': 'Formato no válido.'}), 400
+    if not export_format_available(fmt):
+        return jsonify({'error': f"El formato {EXPORT_FORMATS[fmt][0]} no está disponible en el servidor."}), 400
+    start_date_str, end_date_str, error = resolve_date_range(payload.get('start_date'), payload.get('end_date'), default_days=30)
+    if error:
+        return jsonify({'error': error}), 400
+    hospital_ids = payload.get('hospital_ids') if request.is_json else request.form.getlist('hospital_ids')
+    hospital_ids = hospital_ids or list(HOSPITAL_NAMES)
+    if not isinstance(hospital_ids, list) or any(hospital_id not in HOSPITAL_NAMES for hospital_id in hospital_ids):
+        return jsonify({'error': 'Hospital desconocido.'}), 400
+
+    job = enqueue_export(get_db(), fmt, start_date_str, end_date_str, hospital_ids, session['user_id'])
+    log_action(session['user_id'], f"requested {fmt} export {start_date_str} to {end_date_str}", request.remote_addr)
+    return jsonify(export_job_status(job)), 200 if job['status'] == 'done' else 202
+
+@app.route('/api/exports/<int:job_id>')
+def export_status(job_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'No autorizado.'}), 401
+    job = get_db().execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+    if job is None:
+        return jsonify({'error': 'Exportación no encontrada.'}), 404
+    return jsonify(export_job_status(job))
+
+@app.route('/exports/<int:job_id>/download')
+def download_export(job_id):
+    if 'user_id' not in session or session['role'] != 'admin':
+        return redirect(url_for('login'))
+    job = get_db().execute("SELECT * FROM export_jobs WHERE id = ? AND status = 'done'", (job_id,)).fetchone()
+    if job is None or not os.path.exists(get_export_path(job)):
+        flash('La exportación no está disponible.', 'error')
+        return redirect(url_for('statistics'))
+    response = send_from_directory(
+        os.path.abspath(app.config['EXPORT_FOLDER']),
+        os.path.basename(get_export_path(job)),
+        mimetype=EXPORT_FORMATS[job['format']][1],
+        as_attachment=True,
+        download_name=f"resumen_ejecutivo_{job['start_date']}_{job['end_date']}.{job['format']}",
+    )
+    # Admin-only data behind a sequential URL: shared caches must not store it
+    response.headers['Cache-Control'] = 'private, no-store'
+    return response
+
+# NEW: Change feed. /changes streams the report_changes journal after a cursor, so downstream copies
+# (BI warehouse, caches) can replicate reports incrementally instead of re-reading the table.
+CHANGE_FEED_BATCH_SIZE = 500 # Journal rows read per query while streaming
+CHANGE_FEED_DEFAULT_LIMIT = 10000
+CHANGE_FEED_MAX_LIMIT = 100000
+
+def iter_report_changes(db, since, until_seq=None, limit=None):
+    """Yields the journal rows with seq > since (up to until_seq), reading them in batches by seq."""
+    upper_bound = '' if until_seq is None else f' AND seq <= {int(until_seq)}'
+    remaining = limit
+    while remaining is None or remaining > 0:
+        batch_size = CHANGE_FEED_BATCH_SIZE if remaining is None else min(CHANGE_FEED_BATCH_SIZE, remaining)
+        rows = db.execute(
+            f"SELECT seq, {REPORT_CHANGE_COLUMNS} FROM report_changes WHERE seq > ?{upper_bound} ORDER BY seq LIMIT ?",
+            (since, batch_size)
+        ).fetchall()
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        since = rows[-1]['seq']
+        if remaining is not None:
+            remaining -= len(rows)
+
+def report_change_line(change):
+    """A journal row as one JSON Lines record (checklist_data kept as stored, so replays are exact)."""
+    return json.dumps(dict(change), ensure_ascii=False) + '\n'
+
+@app.route('/changes')
+def report_changes_feed():
+    """Streams report changes after ?since=<seq> as JSON Lines, oldest first.
+
+    Consumers resume from the seq of the last line received. X-Last-Seq is the newest change at
+    the start of the response; a client has caught up once it has read past it. A cursor older
+    than the trimmed journal gets a 410.
+    """
+    if 'user_id' not in session or session['role'] != 'admin':
+        return jsonify({'error': 'No autorizado.'}), 401
+    try:
+        since = int(request.args.get('since', 0))
+        limit = int(request.args.get('limit', CHANGE_FEED_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({'error': 'since y limit deben ser números enteros.'}), 400
+    if since < 0 or not 0 < limit <= CHANGE_FEED_MAX_LIMIT:
+        return jsonify({'error': f'since debe ser >= 0 y limit entre 1 y {CHANGE_FEED_MAX_LIMIT}.'}), 400
+
+    db = get_db()
+    first_seq, last_seq = get_journal_bounds(db)
+    if since < first_seq - 1:
+        # Changes after the cursor were already trimmed: the consumer has to copy the reports again
+        return jsonify({
+            'error': f'Los cambios anteriores al número {first_seq} ya no están en el diario.',
+            'first_seq': first_seq
+        }), 410
+    changes = iter_report_changes(db, since, until_seq=last_seq, limit=limit)
+    response = app.response_class(
+        stream_with_context(report_change_line(change) for change in changes),
+        mimetype='application/x-ndjson'
+    )
+    response.headers['X-Last-Seq'] = str(last_seq)
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
 # NEW: Backup logic
 def backup_database():
-    """Performs a backup of the database."""
+    """Performs a full (base) backup of the database.
+
+    The pending journal rows are saved as a segment first, so the segments stay continuous across
+    bases (needed to restore moments between them). The journal is not trimmed here: that is left
+    to run_scheduled_backup(), so a manual backup never cuts off the /changes consumers.
+    """
+    backup_report_changes()
     # Ensure the backup directory exists
     backup_folder = app.config['BACKUP_FOLDER']
     if not os.path.exists(backup_folder):
@@ -1015,6 +2921,193 @@ def backup_database():
             conn_source.backup(conn_backup)
     
     print(f"Database backed up to {backup_path}")
+    return backup_path
+
+# NEW: Incremental backups. A full copy (base) is taken every BACKUP_BASE_INTERVAL_DAYS; in between, the
+# daily backup only writes the new report_changes rows as a JSON Lines segment. restore_backup() rebuilds
+# the reports of any moment from the last base before it plus the segments (and the live journal).
+BACKUP_BASE_INTERVAL_DAYS = 7
+BACKUP_BASE_PATTERN = re.compile(r'hospital_checklist_(\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2})\.db')
+BACKUP_SEGMENT_PATTERN = re.compile(r'report_changes_(\d+)_(\d+)\.jsonl')
+
+def get_backup_journal_seq(path):
+    """Last journal seq contained in a base backup (None for backups older than the journal)."""
+    try:
+        with closing(connect_read_only(path)) as conn:
+            conn.execute('SELECT 1 FROM report_changes LIMIT 1')
+            return get_journal_bounds(conn)[1]
+    except sqlite3.Error:
+        return None
+
+def get_backup_bases():
+    """[(taken_at ISO timestamp, path)] of the base backups, oldest first."""
+    folder = app.config['BACKUP_FOLDER']
+    if not os.path.isdir(folder):
+        return []
+    bases = []
+    for match in map(BACKUP_BASE_PATTERN.fullmatch, os.listdir(folder)):
+        if match:
+            taken_at = datetime.strptime(match.group(1), '%Y-%m-%d_%H-%M-%S').isoformat()
+            bases.append((taken_at, os.path.join(folder, match.group(0))))
+    return sorted(bases)
+
+def get_backup_segments():
+    """[(first seq, last seq, path)] of the journal segments, oldest first."""
+    folder = app.config['BACKUP_FOLDER']
+    if not os.path.isdir(folder):
+        return []
+    return sorted(
+        (int(match.group(1)), int(match.group(2)), os.path.join(folder, match.group(0)))
+        for match in map(BACKUP_SEGMENT_PATTERN.fullmatch, os.listdir(folder)) if match
+    )
+
+def backup_report_changes():
+    """Writes the journal rows not yet in a segment. Returns the segment path or None."""
+    covered = max([0] + [last for first, last, path in get_backup_segments()])
+    with closing(sqlite3.connect(app.config['DATABASE'])) as conn:
+        conn.row_factory = sqlite3.Row
+        last_seq = get_journal_bounds(conn)[1]
+        if last_seq <= covered:
+            return None
+        first_seq = None
+        os.makedirs(app.config['BACKUP_FOLDER'], exist_ok=True)
+        segment_path = os.path.join(app.config['BACKUP_FOLDER'], 'report_changes_partial.jsonl')
+        with open(segment_path, 'w', encoding='utf-8') as segment:
+            for change in iter_report_changes(conn, covered, until_seq=last_seq):
+                first_seq = first_seq or change['seq']
+                segment.write(report_change_line(change))
+    if first_seq is None: # Everything after the last segment was trimmed (e.g. segments deleted by hand)
+        os.remove(segment_path)
+        return None
+    final_path = os.path.join(app.config['BACKUP_FOLDER'], f"report_changes_{first_seq:012d}_{last_seq:012d}.jsonl")
+    os.replace(segment_path, final_path)
+    print(f"Report changes {first_seq}-{last_seq} backed up to {final_path}")
+    return final_path
+
+def trim_report_changes():
+    """Deletes the journal rows contained in both the latest base and the segments. Returns the count.
+
+    Rows newer than CHANGE_FEED_RETENTION_DAYS are kept even when backed up: /changes consumers
+    that fall behind for less than that resume from their cursor instead of re-copying the reports.
+    """
+    bases = [seq for seq in (get_backup_journal_seq(path) for taken_at, path in get_backup_bases()) if seq is not None]
+    segments = get_backup_segments()
+    if not bases or not segments:
+        return 0
+    retained_since = (datetime.now() - timedelta(days=app.config['CHANGE_FEED_RETENTION_DAYS'])).isoformat()
+    with closing(sqlite3.connect(app.config['DATABASE'])) as conn:
+        # seq grows with changed_at, so the rows past retention are a prefix of the journal
+        covered = conn.execute(
+            'SELECT MAX(seq) FROM report_changes WHERE seq <= ? AND changed_at < ?',
+            (min(bases[-1], segments[-1][1]), retained_since)
+        ).fetchone()[0]
+        if covered is None:
+            return 0
+        before = conn.execute('SELECT COUNT(*) FROM report_changes WHERE seq <= ?', (covered,)).fetchone()[0]
+        run_in_batches(
+            conn, 'DELETE FROM report_changes WHERE seq IN (SELECT seq FROM report_changes WHERE seq <= ? ORDER BY seq LIMIT ?)',
+            (covered,)
+        )
+        conn.commit()
+    return before
+
+def run_scheduled_backup():
+    """Takes a base backup when the last one is BACKUP_BASE_INTERVAL_DAYS old (or missing), else a journal
+    segment, then trims the journal rows that are backed up and past the retention window.
+    """
+    bases = [(taken_at, path) for taken_at, path in get_backup_bases() if get_backup_journal_seq(path) is not None]
+    due = (datetime.now() - timedelta(days=BACKUP_BASE_INTERVAL_DAYS)).isoformat()
+    if not bases or bases[-1][0] <= due:
+        path = backup_database()
+    else:
+        path = backup_report_changes()
+    trim_report_changes()
+    return path
+
+def iter_backup_changes(after_seq, until, live_database=None):
+    """Journal rows with seq > after_seq and changed_at <= until, from the segments and then the live journal.
+
+    Raises ValueError when the segments leave a gap that the live journal cannot fill.
+    """
+    covered = after_seq
+    for first, last, path in get_backup_segments():
+        if last <= covered:
+            continue
+        if first > covered + 1:
+            if live_database is None:
+                raise ValueError(f'Faltan cambios del diario a partir del número {covered + 1}.')
+            break # The live journal holds every change, including the missing segment
+        with open(path, encoding='utf-8') as segment:
+            for line in segment:
+                change = json.loads(line)
+                if change['seq'] > covered and change['changed_at'] <= until:
+                    yield change
+        covered = last
+    if live_database is None:
+        return
+    with closing(connect_read_only(live_database)) as conn:
+        conn.row_factory = sqlite3.Row
+        if get_journal_bounds(conn)[0] > covered + 1:
+            raise ValueError(f'Faltan cambios del diario a partir del número {covered + 1}.')
+        for change in iter_report_changes(conn, covered):
+            if change['changed_at'] <= until:
+                yield dict(change)
+
+def restore_backup(target_path, until=None, live_database=None):
+    """Rebuilds the database as of until (ISO timestamp, default now) into target_path.
+
+    Copies the last base backup taken before until and replays the journal on its reports; the
+    journal itself is restored with its original seq numbers. Other tables are as in the base,
+    except the streaks and alerts derived from reports, which are recomputed.
+    Returns (base path, number of changes replayed).
+    """
+    until = until or datetime.now().isoformat()
+    bases = [
+        (taken_at, path) for taken_at, path in get_backup_bases()
+        if taken_at <= until and get_backup_journal_seq(path) is not None
+    ]
+    if not bases:
+        raise ValueError(f'No hay un respaldo base anterior a {until}.')
+    if os.path.exists(target_path):
+        raise ValueError(f'El archivo {target_path} ya existe.')
+    base_path = bases[-1][1]
+
+    with closing(connect_read_only(base_path)) as source:
+        with closing(sqlite3.connect(target_path)) as db:
+            source.backup(db)
+    with closing(sqlite3.connect(target_path)) as db:
+        db.row_factory = sqlite3.Row
+        base_seq = get_journal_bounds(db)[1]
+        changes = list(iter_backup_changes(base_seq, until, live_database))
+        for change in changes:
+            if change['op'] in ('delete', 'archive'):
+                db.execute('DELETE FROM reports WHERE id = ?', (change['report_id'],))
+            else:
+                db.execute(
+                    f"INSERT OR REPLACE INTO reports (id, {ARCHIVE_REPORT_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (change['report_id'], change['hospital_id'], change['date'], change['checklist_data'],
+                     change['observations'], change['met_goal'], change['operations_performed'],
+                     change['submitted_by'], change['submitted_at'], change['schema_version'])
+                )
+        # Replace the rows the triggers wrote during the replay with the original journal
+        db.execute('DELETE FROM report_changes WHERE seq > ?', (base_seq,))
+        db.executemany(
+            f"INSERT INTO report_changes (seq, {REPORT_CHANGE_COLUMNS}) VALUES ({', '.join('?' * 13)})",
+            [
+                (change['seq'], *(change[column] for column in REPORT_CHANGE_COLUMNS.split(', ')))
+                for change in changes
+            ]
+        )
+        db.execute(
+            "UPDATE sqlite_sequence SET seq = ? WHERE name = 'report_changes'",
+            (changes[-1]['seq'] if changes else base_seq,)
+        )
+        for hospital_id in {row[0] for row in db.execute('SELECT DISTINCT hospital_id FROM problem_streaks UNION SELECT DISTINCT hospital_id FROM reports')}:
+            rebuild_problem_streaks(db, hospital_id)
+        # Archived reports left the live table but not the history, so their alerts stay as they were
+        reconcile_alerts(db, [(change['hospital_id'], change['date']) for change in changes if change['op'] != 'archive'])
+        db.commit()
+    return base_path, len(changes)
 
 # NEW: Scheduled task function
 def schedule_daily_backup():
@@ -1033,7 +3126,35 @@ def schedule_daily_backup():
         time.sleep(time_to_wait)
         
         with app.app_context():
-            backup_database()
+            archive_closed_years(get_db())
+            run_scheduled_backup()
+
+# NEW: Runs the compliance checks at every cut-off in ALERT_CUTOFF_TIMES
+def schedule_alert_checks():
+    """Runs run_alert_checks() now (to catch up) and then at each cut-off time."""
+    while True:
+        with app.app_context():
+            try:
+                run_alert_checks(get_db())
+            except sqlite3.Error as e:
+                print(f"Alert checks failed: {e}")
+        now = datetime.now()
+        upcoming = [datetime.combine(now.date(), cutoff) for cutoff in _alert_cutoffs()]
+        upcoming = [moment for moment in upcoming if moment > now] or [
+            datetime.combine(now.date() + timedelta(days=1), _alert_cutoffs()[0])
+        ]
+        time.sleep((upcoming[0] - now).total_seconds())
+
+# NEW: Keeps the analytics snapshot fresh so requests rarely have to refresh it themselves
+def schedule_analytics_refresh():
+    """Refreshes the analytics snapshot every ANALYTICS_REFRESH_INTERVAL seconds."""
+    while True:
+        with app.app_context():
+            try:
+                refresh_analytics_snapshot(max_age=app.config['ANALYTICS_REFRESH_INTERVAL'] / 2)
+            except sqlite3.Error as e:
+                print(f"Analytics snapshot refresh failed: {e}")
+        time.sleep(app.config['ANALYTICS_REFRESH_INTERVAL'])
 
 @app.route('/backup_bd', methods=['GET'])
 def manual_backup():
@@ -1051,8 +3172,229 @@ def manual_backup():
     
     return redirect(url_for('dashboard'))
 
+# NEW: Hot/cold partitioning. Reports and logs of closed years are moved to ARCHIVE_BD/reports_YYYY.db,
+# so the live database (and its daily backup) only holds recent data.
+ARCHIVE_AFTER_DAYS = 31 # A year is archived once it has been closed for this many days
+ARCHIVE_REPORT_COLUMNS = 'hospital_id, date, checklist_data, observations, met_goal, operations_performed, submitted_by, submitted_at, schema_version'
+ARCHIVE_FILE_PATTERN = re.compile(r'reports_(\d{4})\.db')
+ARCHIVE_ALIAS_PATTERN = re.compile(r'archive_\d{4}')
+# SQLite attaches at most 10 databases per connection; archive_closed_years needs one more
+ARCHIVE_MAX_ATTACHED_YEARS = 8
+
+def get_archive_path(year):
+    return os.path.join(app.config['ARCHIVE_FOLDER'], f"reports_{year}.db")
+
+def get_archived_years():
+    folder = app.config['ARCHIVE_FOLDER']
+    if not os.path.isdir(folder):
+        return []
+    return sorted(int(match.group(1)) for match in map(ARCHIVE_FILE_PATTERN.fullmatch, os.listdir(folder)) if match)
+
+def get_archived_years_in_range(start_date_str, end_date_str):
+    return [
+        year for year in get_archived_years()
+        if f"{year}-01-01" <= end_date_str and f"{year}-12-31" >= start_date_str
+    ]
+
+def reports_source(db, start_date_str, end_date_str):
+    """FROM clause for the reports of a date range: the live table plus the archived years it overlaps.
+
+    Only those archive files are attached to db. A report that is also in the live table
+    (e.g. imported after its year was archived) is read from the live table. Raises ValueError
+    for a range over more than ARCHIVE_MAX_ATTACHED_YEARS archived years (resolve_date_range
+    rejects those before they get here).
+    """
+    years = get_archived_years_in_range(start_date_str, end_date_str)
+    if len(years) > ARCHIVE_MAX_ATTACHED_YEARS:
+        raise ValueError(f"El rango abarca {len(years)} años archivados; el máximo es {ARCHIVE_MAX_ATTACHED_YEARS}.")
+    aliases = [f"archive_{year}" for year in years]
+    attached = {row[1] for row in db.execute('PRAGMA database_list')}
+    attached_archives = {alias for alias in attached if ARCHIVE_ALIAS_PATTERN.fullmatch(alias)}
+    if len(attached_archives | set(aliases)) > ARCHIVE_MAX_ATTACHED_YEARS:
+        # A connection reused for several ranges would otherwise pile up attachments past SQLite's limit
+        for alias in sorted(attached_archives - set(aliases)):
+            db.execute(f"DETACH DATABASE {alias}")
+    sources = []
+    for year, alias in zip(years, aliases):
+        if alias not in attached:
+            db.execute(f"ATTACH DATABASE ? AS {alias}", (get_archive_path(year),))
+        sources.append(
+            f"SELECT {ARCHIVE_REPORT_COLUMNS} FROM {alias}.reports a WHERE NOT EXISTS "
+            f"(SELECT 1 FROM main.reports m WHERE m.hospital_id = a.hospital_id AND m.date = a.date)"
+        )
+    if not sources:
+        return 'reports'
+    sources.insert(0, f"SELECT {ARCHIVE_REPORT_COLUMNS} FROM main.reports")
+    return '(' + ' UNION ALL '.join(sources) + ')'
+
+def archive_closed_years(db):
+    """Moves the reports and logs of closed years into their archive files.
+
+    Each year is copied and deleted from the live database in one transaction.
+    Returns {year: (reports moved, logs moved)}.
+    """
+    first_open_year = (datetime.now() - timedelta(days=ARCHIVE_AFTER_DAYS)).year
+    cutoff = f"{first_open_year}-01-01"
+    years = sorted({int(row[0]) for row in db.execute(
+        'SELECT substr(date, 1, 4) FROM reports WHERE date < ? '
+        'UNION SELECT substr(timestamp, 1, 4) FROM logs WHERE timestamp < ?',
+        (cutoff, cutoff)
+    )})
+
+    archived = {}
+    for year in years:
+        os.makedirs(app.config['ARCHIVE_FOLDER'], exist_ok=True)
+        start, end = f"{year}-01-01", f"{year + 1}-01-01"
+        db.execute('ATTACH DATABASE ? AS archive', (get_archive_path(year),))
+        try:
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS archive.reports (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    hospital_id TEXT NOT NULL,
+                    date TEXT NOT NULL,
+                    checklist_data TEXT NOT NULL,
+                    observations TEXT,
+                    met_goal INTEGER,
+                    operations_performed INTEGER,
+                    submitted_by INTEGER,
+                    submitted_at TEXT,
+                    schema_version INTEGER
+                )
+            ''')
+            db.execute('CREATE UNIQUE INDEX IF NOT EXISTS archive.idx_reports_hospital_date ON reports (hospital_id, date)')
+            db.execute('''
+                CREATE TABLE IF NOT EXISTS archive.logs (
+                    id INTEGER PRIMARY KEY,
+                    user_id INTEGER,
+                    action TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    ip_address TEXT
+                )
+            ''')
+            try:
+                reports_moved = db.execute(
+                    f"INSERT OR REPLACE INTO archive.reports ({ARCHIVE_REPORT_COLUMNS}) "
+                    f"SELECT {ARCHIVE_REPORT_COLUMNS} FROM main.reports WHERE date >= ? AND date < ?",
+                    (start, end)
+                ).rowcount
+                logs_moved = db.execute(
+                    'INSERT OR IGNORE INTO archive.logs (id, user_id, action, timestamp, ip_address) '
+                    'SELECT id, user_id, action, timestamp, ip_address FROM main.logs WHERE timestamp >= ? AND timestamp < ?',
+                    (start, end)
+                ).rowcount
+                last_seq = get_journal_bounds(db)[1]
+                db.execute('DELETE FROM main.reports WHERE date >= ? AND date < ?', (start, end))
+                # Journaled as 'archive' rather than 'delete': the reports still exist, in the archive file
+                db.execute("UPDATE main.report_changes SET op = 'archive' WHERE seq > ? AND op = 'delete'", (last_seq,))
+                db.execute('DELETE FROM main.logs WHERE timestamp >= ? AND timestamp < ?', (start, end))
+                db.commit()
+            except sqlite3.Error:
+                db.rollback()
+                raise
+        finally:
+            db.execute('DETACH DATABASE archive')
+        archived[year] = (reports_moved, logs_moved)
+        print(f"Archived {year}: {reports_moved} reports, {logs_moved} logs -> {get_archive_path(year)}")
+    return archived
+
+@app.cli.command('import-reports')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['jsonl', 'csv']), help='Formato del archivo (por defecto según la extensión).')
+@click.option('--user', 'username', default='admin', show_default=True, help='Usuario registrado como remitente de los reportes.')
+def import_reports_command(path, fmt, username):
+    """Imports dated reports from a JSON Lines or CSV file."""
+    db = get_db()
+    user = db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
+    if user is None:
+        raise click.ClickException(f'Usuario desconocido: {username}')
+
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        results = import_reports(db, read_import_records(stream, fmt), user['id'])
+
+    for result in results:
+        if result['status'] == 'error':
+            click.echo(f"Línea {result['line']}: {result['error']}", err=True)
+    summary = summarize_import(results)
+    log_action(user['id'], f"bulk imported reports from {os.path.basename(path)}: {summary['inserted']} inserted, {summary['updated']} updated, {summary['error']} rejected")
+    click.echo(f"Insertados: {summary['inserted']}, actualizados: {summary['updated']}, rechazados: {summary['error']}")
+
+@app.cli.command('migrate')
+def migrate_command():
+    """Applies the pending database migrations."""
+    applied = init_db()
+    if applied:
+        click.echo(f"Migraciones aplicadas: {', '.join(map(str, applied))}")
+    else:
+        click.echo(f"La base de datos ya está en la versión {MIGRATIONS[-1][0]}.")
+
+@app.cli.command('refresh-analytics')
+def refresh_analytics_command():
+    """Refreshes the analytics snapshot (for WSGI deployments, where the refresh thread does not run)."""
+    if refresh_analytics_snapshot():
+        click.echo('Instantánea de análisis actualizada.')
+    else:
+        click.echo('Sin cambios desde la última instantánea.')
+
+@app.cli.command('check-alerts')
+def check_alerts_command():
+    """Writes the missing-report and below-goal alerts due now (for cron-driven deployments)."""
+    closed = run_alert_checks(get_db())
+    click.echo(f"Días cerrados: {', '.join(closed) if closed else 'ninguno'}")
+
+@app.cli.command('run-export-jobs')
+@click.option('--until-empty', is_flag=True, help='Termina cuando no quedan exportaciones en cola.')
+def run_export_jobs_command(until_empty):
+    """Processes queued executive summary exports (a worker separate from the web server)."""
+    requeue_interrupted_exports()
+    run_export_jobs(until_empty=until_empty)
+
+@app.cli.command('backup')
+@click.option('--incremental', is_flag=True, help='Solo guarda los cambios del diario desde el último respaldo (o un respaldo base si corresponde).')
+def backup_command(incremental):
+    """Backs up the database (for cron-driven deployments)."""
+    path = run_scheduled_backup() if incremental else backup_database()
+    click.echo(f"Respaldo: {path}" if path else 'No hay cambios nuevos desde el último respaldo.')
+
+@app.cli.command('restore-backup')
+@click.argument('target', type=click.Path(dir_okay=False))
+@click.option('--until', help='Momento a restaurar (AAAA-MM-DD HH:MM:SS, por defecto el más reciente).')
+@click.option('--no-live-journal', is_flag=True, help='No usar el diario de la base de datos activa (p. ej. si está dañada).')
+def restore_backup_command(target, until, no_live_journal):
+    """Restores the database as of a moment into TARGET, from a base backup and the journal segments."""
+    if until:
+        try:
+            until = datetime.fromisoformat(until).isoformat()
+        except ValueError:
+            raise click.ClickException('Formato de fecha inválido. Use AAAA-MM-DD HH:MM:SS.')
+    live_database = None if no_live_journal else app.config['DATABASE']
+    try:
+        base_path, replayed = restore_backup(target, until, live_database)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restaurado en {target} desde {os.path.basename(base_path)} con {replayed} cambios del diario.")
+
+@app.cli.command('archive-reports')
+@click.option('--vacuum', is_flag=True, help='Compacta la base de datos activa después de archivar.')
+def archive_reports_command(vacuum):
+    """Moves reports and logs of closed years to per-year archive databases."""
+    db = get_db()
+    archived = archive_closed_years(db)
+    if not archived:
+        click.echo('No hay años cerrados por archivar.')
+    if archived and vacuum:
+        db.execute('VACUUM')
+        click.echo('Base de datos compactada.')
+
 if __name__ == '__main__':
     init_db()
     backup_thread = Thread(target=schedule_daily_backup, daemon=True)
     backup_thread.start()
+    analytics_thread = Thread(target=schedule_analytics_refresh, daemon=True)
+    analytics_thread.start()
+    alerts_thread = Thread(target=schedule_alert_checks, daemon=True)
+    alerts_thread.start()
+    requeue_interrupted_exports()
+    for _ in range(EXPORT_WORKERS):
+        Thread(target=run_export_jobs, daemon=True).start()
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,131 @@
+# build_assets.py
+#
+# Builds the self-hosted front-end assets served from static/dist:
+#   - a purged, minified Tailwind stylesheet (instead of the Tailwind Play CDN)
+#   - pinned copies of Chart.js and Alpine.js (instead of jsdelivr)
+#   - optimized copies of the PNG images
+# Every file gets a content-hash name, gzip/brotli variants and an entry in
+# static/dist/manifest.json, which app.py reads through asset_url().
+#
+# Usage: python build_assets.py
+# Requires the Tailwind CLI (npx tailwindcss, or set TAILWIND_CLI to a standalone binary).
+# Pillow and brotli are optional: without them images are copied as-is and no .br files are written.
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import urllib.request
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+VENDOR_DIR = os.path.join(STATIC_DIR, 'vendor')
+MANIFEST_PATH = os.path.join(DIST_DIR, 'manifest.json')
+
+# Pinned versions; vendored files are downloaded once into static/vendor (not committed, see .gitignore)
+VENDOR_SCRIPTS = {
+    'chart.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.min.js',
+    'alpine.js': 'https://cdn.jsdelivr.net/npm/alpinejs@3.13.3/dist/cdn.min.js',
+}
+
+IMAGES = ['logo.png', 'hospital.png']
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json')
+
+
+def build_stylesheet(output_path):
+    """Compiles static/src/app.css with Tailwind, keeping only the classes used by the templates."""
+    cli = os.environ.get('TAILWIND_CLI')
+    command = [cli] if cli else ['npx', '--yes', 'tailwindcss@3']
+    command += [
+        '--config', os.path.join(BASE_DIR, 'tailwind.config.js'),
+        '--input', os.path.join(STATIC_DIR, 'src', 'app.css'),
+        '--output', output_path,
+        '--minify',
+    ]
+    subprocess.run(command, check=True, cwd=BASE_DIR)
+
+
+def vendor_script(name, url):
+    path = os.path.join(VENDOR_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(VENDOR_DIR, exist_ok=True)
+        print(f"Downloading {url}")
+        with urllib.request.urlopen(url) as response, open(path, 'wb') as f:
+            shutil.copyfileobj(response, f)
+    return path
+
+
+def optimize_image(source, output_path):
+    try:
+        from PIL import Image
+    except ImportError:
+        shutil.copyfile(source, output_path)
+        return
+    with Image.open(source) as image:
+        image.save(output_path, optimize=True)
+    # Keep the original when re-encoding does not help
+    if os.path.getsize(output_path) > os.path.getsize(source):
+        shutil.copyfile(source, output_path)
+
+
+def fingerprint(name, source_path):
+    """Copies an asset to static/dist under a content-hash name and writes compressed variants."""
+    with open(source_path, 'rb') as f:
+        content = f.read()
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    stem, extension = os.path.splitext(name)
+    hashed_name = f"{stem}.{digest}{extension}"
+    hashed_path = os.path.join(DIST_DIR, hashed_name)
+    with open(hashed_path, 'wb') as f:
+        f.write(content)
+
+    if extension in COMPRESSIBLE_EXTENSIONS:
+        with open(hashed_path + '.gz', 'wb') as f:
+            f.write(gzip.compress(content, compresslevel=9, mtime=0))
+        try:
+            import brotli
+        except ImportError:
+            pass
+        else:
+            with open(hashed_path + '.br', 'wb') as f:
+                f.write(brotli.compress(content, quality=11))
+    return hashed_name
+
+
+def main():
+    if os.path.exists(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {}
+    with tempfile.TemporaryDirectory() as build_dir:
+        stylesheet = os.path.join(build_dir, 'app.css')
+        build_stylesheet(stylesheet)
+        manifest['app.css'] = fingerprint('app.css', stylesheet)
+
+        for name, url in VENDOR_SCRIPTS.items():
+            manifest[name] = fingerprint(name, vendor_script(name, url))
+
+        for name in IMAGES:
+            optimized = os.path.join(build_dir, name)
+            optimize_image(os.path.join(STATIC_DIR, name), optimized)
+            manifest[name] = fingerprint(name, optimized)
+
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    for name, hashed_name in sorted(manifest.items()):
+        print(f"{name} -> dist/{hashed_name}")
+
+
+if __name__ == '__main__':
+    try:
+        main()
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Asset build failed: {e}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,6 @@
+// Tailwind configuration used by build_assets.py. The theme lives in tailwind.theme.json, which
+// templates/base.html also uses for the in-browser fallback when there is no asset build.
+module.exports = {
+    content: ['./templates/**/*.html'],
+    theme: require('./tailwind.theme.json')
+}